@@ -0,0 +1,464 @@
+"""
+Performance benchmarks of the assignment counting engines.
+Run all of them with `python benchmarks.py`, or some of them with `python benchmarks.py <name> ...`.
+The 'suite' benchmark fails if it expands more search nodes than the baseline in benchmark_baseline.json, or with
+--check-times, if it got slower relative to a reference workload;
+`python benchmarks.py suite --save-baseline` saves a new baseline.
+"""
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+import itertools
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+from count_assignments import (DEFAULT_SCHEMA, HINT_ORDERINGS, np, AbsoluteHint, Animal, Color, Floor, Hint, NeighborHint, 
+                               RelativeHint, SearchState, SearchStats, TowerSchema, backtrack, compile_hints, count_assignments, 
+                               count_assignments_parallel, generate_unique_puzzle, get_process_pool, hints_satisfied_by, 
+                               iter_assignments, normalize_hints, pack_assignment)
+
+# The examples of the README.
+README_EXAMPLES = {
+    'example 1': [
+        AbsoluteHint(Animal.Rabbit, Floor.First),
+        AbsoluteHint(Animal.Chicken, Floor.Second),
+        AbsoluteHint(Floor.Third, Color.Yellow),
+        AbsoluteHint(Animal.Bird, Floor.Fifth),
+        AbsoluteHint(Animal.Grasshopper, Color.Blue),
+        NeighborHint(Color.Red, Color.Green),
+    ],
+    'example 2': [
+        AbsoluteHint(Animal.Bird, Floor.Fifth),
+        AbsoluteHint(Floor.First, Color.Green),
+        AbsoluteHint(Animal.Frog, Color.Yellow),
+        NeighborHint(Animal.Frog, Animal.Grasshopper),
+        NeighborHint(Color.Red, Color.Orange),
+        RelativeHint(Animal.Chicken, Color.Blue, -4),
+    ],
+    'example 3': [
+        RelativeHint(Animal.Rabbit, Color.Green, -2),
+    ],
+}
+
+# A puzzle with many coupled Neighbor/Relative hints, which branch the most.
+HARD_HINTS = [
+    NeighborHint(Color.Red, Animal.Frog),
+    NeighborHint(Color.Blue, Animal.Bird),
+    NeighborHint(Color.Green, Animal.Rabbit),
+    NeighborHint(Animal.Frog, Animal.Grasshopper),
+    NeighborHint(Color.Red, Color.Orange),
+    RelativeHint(Animal.Bird, Color.Green, 2),
+    NeighborHint(Animal.Rabbit, Floor.Third),
+]
+
+def time_call(function: Callable[[], object], repeat: int = 3) -> float:
+    """ Returns the best wall time of `repeat` calls of the function, in seconds. """
+    best_time = float('inf')
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        function()
+        best_time = min(best_time, time.perf_counter() - start_time)
+    return best_time
+
+def benchmark_parallel_split(hints: List[Hint] = HARD_HINTS, worker_counts: Sequence[int] = (1, 2, 4, 8), repeat: int = 3):
+    """ Prints the speedup of counting a single puzzle with count_assignments_parallel as the number of workers grows. """
+    expected_count = count_assignments(hints)
+    serial_time = time_call(lambda: count_assignments(hints), repeat)
+    print(f'parallel split: {len(hints)} hints, {expected_count} assignments, serial {serial_time * 1000:.2f}ms')
+    for workers in worker_counts:
+        get_process_pool(workers)  # Don't count the pool start up.
+        assert count_assignments_parallel(hints, workers=workers) == expected_count
+        parallel_time = time_call(lambda: count_assignments_parallel(hints, workers=workers), repeat)
+        print(f'  {workers} workers: {parallel_time * 1000:.2f}ms, speedup x{serial_time / parallel_time:.2f}')
+
+def random_hints(rng: random.Random, length: int, schema: TowerSchema = DEFAULT_SCHEMA) -> List[Hint]:
+    """
+    Returns `length` random hints between random values of the schema's families (colors and animals by default),
+    mostly Neighbor and Relative ones.
+    """
+    attributes = [value for family in schema.families for value in family]
+    hints = []
+    for _ in range(length):
+        attr1, attr2 = rng.sample(attributes, 2)
+        hint_type = rng.choice((AbsoluteHint, RelativeHint, NeighborHint, NeighborHint))
+        if hint_type is RelativeHint:
+            hints.append(RelativeHint(attr1, attr2, rng.choice((-2, -1, 1, 2))))
+        else:
+            hints.append(hint_type(attr1, attr2))
+    return hints
+
+def benchmark_node_counts(engines: Sequence[str] = ('backtrack', 'propagation'), random_puzzles: int = 200, seed: int = 0):
+    """ Prints the number of search nodes every engine expands on the README examples and on random hard puzzles. """
+    rng = random.Random(seed)
+    puzzles = dict(README_EXAMPLES)
+    puzzles[f'{random_puzzles} random'] = None
+    random_hint_lists = [random_hints(rng, rng.randint(5, 9)) for _ in range(random_puzzles)]
+    print('search nodes: ' + ', '.join(engines))
+    for name, hints in puzzles.items():
+        hint_lists = [hints] if hints is not None else random_hint_lists
+        nodes = []
+        for engine in engines:
+            stats = SearchStats()
+            for hints in hint_lists:
+                count_assignments(hints, engine=engine, stats=stats)
+            nodes.append(stats.nodes)
+        print(f'  {name}: ' + ', '.join(str(engine_nodes) for engine_nodes in nodes))
+
+def benchmark_hint_orderings(random_puzzles: int = 300, seed: int = 0):
+    """
+    Prints the search nodes and time of every hint ordering strategy on random puzzles,
+    given in their generated order and reversed.
+    """
+    rng = random.Random(seed)
+    hint_lists = [random_hints(rng, rng.randint(5, 9)) for _ in range(random_puzzles)]
+    print(f'hint orderings, {random_puzzles} random puzzles:')
+    for name, ordering in HINT_ORDERINGS.items():
+        for order_name, ordered_hint_lists in (('generated', hint_lists), ('reversed', [hints[::-1] for hints in hint_lists])):
+            stats = SearchStats()
+            def count_all():
+                for hints in ordered_hint_lists:
+                    count_assignments(hints, ordering=ordering, stats=stats)
+            run_time = time_call(count_all, repeat=1)
+            print(f'  {name}, {order_name} order: {stats.nodes} nodes, {run_time * 1000:.1f}ms')
+
+def benchmark_schema_scaling(floor_counts: Sequence[int] = (5, 6, 8), family_counts: Sequence[int] = (2, 3),
+                             engines: Sequence[str] = ('backtrack', 'propagation'), random_puzzles: int = 10, seed: int = 0):
+    """
+    Prints the search nodes and time of every engine on random puzzles in towers of growing schemas,
+    with as many hints as floors. Towers of 10 floors and 3 families already take a minute with the propagation engine.
+    """
+    print(f'schema scaling, {random_puzzles} random puzzles per schema:')
+    for family_count in family_counts:
+        for floor_count in floor_counts:
+            schema = TowerSchema(floor_count, [(f'Family{family}x{floor_count}', [f'Value{value}' for value in range(floor_count)]) 
+                                               for family in range(family_count)])
+            rng = random.Random(seed)
+            hint_lists = [random_hints(rng, floor_count, schema) for _ in range(random_puzzles)]
+            results = []
+            for engine in engines:
+                stats = SearchStats()
+                def count_all():
+                    for hints in hint_lists:
+                        count_assignments(hints, engine=engine, stats=stats, schema=schema)
+                run_time = time_call(count_all, repeat=1)
+                results.append(f'{engine} {stats.nodes} nodes, {run_time * 1000:.1f}ms')
+            print(f'  {floor_count} floors x {family_count} families: ' + ', '.join(results))
+
+def random_absolute_hints(rng: random.Random, length: int, schema: TowerSchema) -> List[Hint]:
+    """
+    Returns `length` random AbsoluteHints that hold in a random assignment of the schema, between a value and its floor
+    or two values of different families on the same floor.
+    """
+    floors = {value: floor for family in schema.families 
+              for value, floor in zip(family, rng.sample(list(schema.floors), len(schema.floors)))}
+    hints = []
+    for _ in range(length):
+        family1, family2 = rng.sample(schema.families, 2)
+        value = rng.choice(list(family1))
+        if rng.random() < 0.3:
+            hints.append(AbsoluteHint(value, floors[value]))
+        else:
+            hints.append(AbsoluteHint(value, next(other for other in family2 if floors[other] == floors[value])))
+    return hints
+
+def benchmark_absolute_hints(floor_counts: Sequence[int] = (5, 6, 8, 10, 12, 16), max_search_floors: int = 10,
+                             random_puzzles: int = 20, seed: int = 0):
+    """
+    Prints the time to count random solvable puzzles of AbsoluteHints only, in towers of growing size with two families,
+    by count_assignments (which counts them without a search, see count_absolute_hints) and by the backtracking search,
+    in towers of up to max_search_floors floors (it takes seconds beyond 10 floors).
+    """
+    print(f'absolute hints, {random_puzzles} random puzzles per tower:')
+    for floor_count in floor_counts:
+        schema = TowerSchema(floor_count, [(f'Family{family}x{floor_count}', [f'Value{value}' for value in range(floor_count)]) 
+                                           for family in range(2)])
+        rng = random.Random(seed)
+        hint_lists = [random_absolute_hints(rng, floor_count, schema) for _ in range(random_puzzles)]
+        direct_time = time_call(lambda: [count_assignments(hints, schema=schema) for hints in hint_lists], repeat=1)
+        if floor_count > max_search_floors:
+            print(f'  {floor_count} floors: direct {direct_time * 1000:.1f}ms')
+            continue
+        counts = [count_assignments(hints, schema=schema) for hints in hint_lists]
+        assert counts == [backtrack(normalize_hints(hints, schema), SearchState(schema=schema)) for hints in hint_lists]
+        search_time = time_call(lambda: [backtrack(normalize_hints(hints, schema), SearchState(schema=schema)) 
+                                         for hints in hint_lists], repeat=1)
+        print(f'  {floor_count} floors: direct {direct_time * 1000:.1f}ms, search {search_time * 1000:.1f}ms')
+
+def benchmark_search_profile(random_puzzles: int = 300, slowest: int = 5, seed: int = 0):
+    """
+    Prints the search statistics (see SearchStats) of the random puzzles that took the longest to count,
+    next to the median puzzle's, to show where their time goes.
+    """
+    rng = random.Random(seed)
+    profiles = []
+    for _ in range(random_puzzles):
+        hints = random_hints(rng, rng.randint(5, 9))
+        stats = SearchStats()
+        count_assignments(hints, stats=stats)
+        profiles.append((sum(stats.phase_times.values()), len(hints), stats))
+    profiles.sort(key=lambda profile: profile[0])
+    print(f'search profile, {random_puzzles} random puzzles (median, then the {slowest} slowest):')
+    for run_time, hint_count, stats in [profiles[len(profiles) // 2]] + profiles[-slowest:]:
+        print(f'  {run_time * 1000:.2f}ms, {hint_count} hints: {stats.nodes} nodes, {stats.dead_ends} dead ends, '
+              f'depth {stats.max_depth}, {stats.placement_checks} checks, branches {stats.branches}, '
+              f'cache {stats.cache_hits}/{stats.cache_hits + stats.cache_misses} hits')
+
+# The mix of hint types of generate_hints: the relative weight of every type.
+DEFAULT_HINT_MIX = {AbsoluteHint: 1.0, RelativeHint: 1.0, NeighborHint: 2.0}
+
+def generate_hints(rng: random.Random, 
+                   length: int, 
+                   mix: Dict[type, float] = DEFAULT_HINT_MIX, 
+                   floor_share: float = 0.1) -> List[Hint]:
+    """
+    Returns `length` random hints of the default tower, of types drawn with the weights of the mix.
+    Every attribute is a floor with probability floor_share, and a random color or animal otherwise.
+    """
+    hint_types, weights = zip(*mix.items())
+    values = list(Color) + list(Animal)
+    hints = []
+    for _ in range(length):
+        attr1, attr2 = [rng.choice(list(Floor)) if rng.random() < floor_share else rng.choice(values) for _ in range(2)]
+        hint_type = rng.choices(hint_types, weights)[0]
+        if hint_type is RelativeHint:
+            hints.append(RelativeHint(attr1, attr2, rng.choice((-3, -2, -1, 1, 2, 3))))
+        else:
+            hints.append(hint_type(attr1, attr2))
+    return hints
+
+def count_by_brute_force(hints: List[Hint]) -> int:
+    """
+    The oracle the engines are checked against: counts the assignments that satisfy the hints by checking every one of
+    the 14,400 assignments of the default tower (every permutation of the colors with every permutation of the animals)
+    with the compiled hints (see compile_hints).
+    """
+    satisfied = compile_hints(hints)
+    permutations = list(itertools.permutations(range(1, len(Floor) + 1)))
+    return sum(1 for color_floors in permutations for animal_floors in permutations if satisfied((color_floors, animal_floors)))
+
+# The solution count buckets of the benchmark suite: a name and the range of counts in it.
+SOLUTION_BUCKETS = {'none': (0, 0), 'unique': (1, 1), 'few': (2, 100), 'many': (101, None)}
+
+def solution_bucket(count: int) -> str:
+    for name, (low, high) in SOLUTION_BUCKETS.items():
+        if low <= count and (high is None or count <= high):
+            return name
+
+def generate_puzzle_suite(seed: int = 0, 
+                          puzzles_per_bucket: int = 10, 
+                          lengths: Tuple[int, int] = (4, 10),
+                          mix: Dict[type, float] = DEFAULT_HINT_MIX, 
+                          max_attempts: int = 100000) -> Dict[str, List[List[Hint]]]:
+    """
+    Generates random hint lists (see generate_hints) of lengths in the given range until every solution count bucket
+    (see SOLUTION_BUCKETS) has puzzles_per_bucket of them. The same seed always gives the same suite.
+    """
+    rng = random.Random(seed)
+    suite = {name: [] for name in SOLUTION_BUCKETS}
+    for _ in range(max_attempts):
+        if all(len(puzzles) == puzzles_per_bucket for puzzles in suite.values()):
+            break
+        hints = generate_hints(rng, rng.randint(*lengths), mix)
+        puzzles = suite[solution_bucket(count_assignments(hints))]
+        if len(puzzles) < puzzles_per_bucket:
+            puzzles.append(hints)
+    return suite
+
+def suite_engines() -> Dict[str, Callable[[List[Hint], Optional[SearchStats]], int]]:
+    """ The engines the suite times: every engine of count_assignments, the numpy one only if numpy is installed. """
+    engines = {
+        'backtrack': lambda hints, stats: count_assignments(hints, stats=stats),
+        'in_order': lambda hints, stats: count_assignments(hints, stats=stats, ordering=HINT_ORDERINGS['in_order']),
+        'propagation': lambda hints, stats: count_assignments(hints, engine='propagation', stats=stats),
+    }
+    if np is not None:
+        engines['numpy'] = lambda hints, stats: count_assignments(hints, engine='numpy', stats=stats)
+    return engines
+
+def time_reference_workload(repeat: int = 3) -> float:
+    """
+    Returns the best wall time of a fixed workload, in seconds: brute force counting the first README example.
+    Times of the suite relative to it are comparable between runs on machines of different speed or load.
+    """
+    hints = README_EXAMPLES['example 1']
+    return time_call(lambda: count_by_brute_force(hints), repeat)
+
+def run_puzzle_suite(suite: Dict[str, List[List[Hint]]], repeat: int = 3) -> Dict[str, Dict[str, Dict[str, float]]]:
+    """
+    Counts every puzzle of the suite with every engine, checking the counts against the brute force oracle
+    (raises AssertionError on a mismatch), and returns the results by engine and bucket:
+    the search nodes expanded, the best total wall time of `repeat` runs in milliseconds, and that time relative to
+    the best time of the reference workload (see time_reference_workload), which is run between the runs of the engine.
+    """
+    expected_counts = {bucket: [count_by_brute_force(hints) for hints in puzzles] for bucket, puzzles in suite.items()}
+    results = {}
+    for engine, count in suite_engines().items():
+        results[engine] = {}
+        for bucket, puzzles in suite.items():
+            stats = SearchStats()
+            counts = [count(hints, stats) for hints in puzzles]
+            for hints, engine_count, expected_count in zip(puzzles, counts, expected_counts[bucket]):
+                assert engine_count == expected_count, f'{engine} counts {engine_count} instead of {expected_count}: {hints}'
+            # The speed of the machine drifts, so the reference is timed along with the engine.
+            run_time = reference_time = float('inf')
+            for _ in range(repeat):
+                reference_time = min(reference_time, time_reference_workload(repeat=1))
+                run_time = min(run_time, time_call(lambda: [count(hints, None) for hints in puzzles], repeat=1))
+            results[engine][bucket] = {'nodes': stats.nodes, 'ms': round(run_time * 1000, 3), 
+                                       'relative_time': round(run_time / reference_time, 4)}
+    return results
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_baseline.json')
+
+def compare_to_baseline(results: Dict, baseline: Dict, check_times: bool = False, time_tolerance: float = 2.0, 
+                        min_ms: float = 5.0) -> List[str]:
+    """
+    Returns the regressions of the results from the baseline: search node counts that grew at all (they don't depend on
+    the machine, so they always fail the suite). If check_times is set, also the times relative to the reference
+    workload that grew more than time_tolerance fold (times below min_ms are too noisy to compare). Other processes
+    competing for the CPU skew even relative times, so they're only compared on request, on an idle machine.
+    """
+    regressions = []
+    for engine, buckets in baseline.items():
+        for bucket, baseline_result in buckets.items():
+            result = results.get(engine, {}).get(bucket)
+            if result is None:
+                continue
+            if result['nodes'] > baseline_result['nodes']:
+                regressions.append(f'{engine}/{bucket}: {result["nodes"]} nodes, baseline {baseline_result["nodes"]}')
+            if not check_times or 'relative_time' not in baseline_result or result['ms'] < min_ms:
+                continue
+            if result['relative_time'] > baseline_result['relative_time'] * time_tolerance:
+                regressions.append(f'{engine}/{bucket}: {result["relative_time"]} times the reference workload, '
+                                   f'baseline {baseline_result["relative_time"]}')
+    return regressions
+
+def benchmark_puzzle_suite(seed: int = 0, puzzles_per_bucket: int = 10, baseline_path: str = BASELINE_PATH):
+    """
+    Runs the seeded puzzle suite (see generate_puzzle_suite and run_puzzle_suite) and compares it to the JSON baseline:
+    fails with SystemExit if any engine expanded more search nodes, or with --check-times on the command line, 
+    got slower (see compare_to_baseline). Saves the results as the new baseline if there's none yet, 
+    or if --save-baseline is given on the command line.
+    """
+    suite = generate_puzzle_suite(seed, puzzles_per_bucket)
+    results = run_puzzle_suite(suite)
+    print(f'puzzle suite, seed {seed}, {puzzles_per_bucket} puzzles per bucket (nodes, ms, relative time):')
+    for engine, buckets in results.items():
+        print(f'  {engine}: ' + ', '.join(f'{bucket} {result["nodes"]}, {result["ms"]:.1f}ms, {result["relative_time"]:.2f}' 
+                                         for bucket, result in buckets.items()))
+    if '--save-baseline' in sys.argv or not os.path.exists(baseline_path):
+        with open(baseline_path, 'w') as baseline_file:
+            json.dump(results, baseline_file, indent=2, sort_keys=True)
+        print(f'  saved the baseline to {baseline_path}')
+        return
+    with open(baseline_path) as baseline_file:
+        regressions = compare_to_baseline(results, json.load(baseline_file), check_times='--check-times' in sys.argv)
+    if regressions:
+        raise SystemExit('Performance regressions:\n  ' + '\n  '.join(regressions))
+    print('  no regressions from the baseline')
+
+def measure_memory(function: Callable[[], object]) -> Tuple[int, int]:
+    """ Returns the peak memory allocated by a call of the function, and the memory its result holds on to, in bytes. """
+    tracemalloc.start()
+    try:
+        result = function()
+        retained_size, peak_size = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+    return peak_size, retained_size
+
+def benchmark_memory(repeat: int = 200, seed: int = 0):
+    """
+    Prints the time and memory of the workloads that allocate the most: expanding the README hints with the list based
+    get_possible_floor_assignments, enumerating all 14,400 assignments, and counting the puzzle suite.
+    """
+    floors, colors, animals = list(Floor), list(Color), list(Animal)
+    def expand_hints():
+        for _ in range(repeat):
+            for hints in README_EXAMPLES.values():
+                for hint in hints:
+                    hint.get_possible_floor_assignments(floors, animals, colors, [])
+    suite = generate_puzzle_suite(seed)
+    def count_suite():
+        for puzzles in suite.values():
+            for hints in puzzles:
+                count_assignments(hints)
+    print('memory:')
+    for name, function in (('expand README hints', expand_hints), ('enumerate all assignments', lambda: list(iter_assignments([]))),
+                           ('count the puzzle suite', count_suite)):
+        run_time = time_call(function)
+        peak_size, retained_size = measure_memory(function)
+        print(f'  {name}: {run_time * 1000:.1f}ms, peak {peak_size / 1024:.0f}KiB, retained {retained_size / 1024:.0f}KiB')
+
+def benchmark_verification(repeat: int = 100):
+    """
+    Prints the time to verify the solutions of the README examples with every hint's list based check_if_satisfied,
+    and with the compiled hints (see compile_hints) on packed assignments.
+    """
+    print(f'verification, {repeat} times every solution:')
+    for name, hints in README_EXAMPLES.items():
+        solutions = list(iter_assignments(hints))
+        satisfied = compile_hints(hints)
+        packed_solutions = [pack_assignment(solution) for solution in solutions]
+        assert all(satisfied(positions) for positions in packed_solutions)
+        list_time = time_call(lambda: [all(hint.check_if_satisfied(solution) for hint in hints) 
+                                       for _ in range(repeat) for solution in solutions], repeat=1)
+        compiled_time = time_call(lambda: [satisfied(positions) for _ in range(repeat) for positions in packed_solutions], repeat=1)
+        print(f'  {name}, {len(solutions)} solutions: check_if_satisfied {list_time * 1000:.1f}ms, '
+              f'compiled {compiled_time * 1000:.1f}ms')
+
+def generate_unique_puzzle_by_counting(rng: random.Random) -> List[Hint]:
+    """
+    Generates a puzzle with a single solution like generate_unique_puzzle (with the default weights),
+    but recounts every candidate hint list from scratch with count_assignments: fully while adding hints,
+    to know if they rule out any assignment, and with a limit of 2 while removing them.
+    """
+    candidates = hints_satisfied_by(rng.randrange(120 * 120))
+    rng.shuffle(candidates)
+    hints = []
+    count = count_assignments(hints)
+    while count != 1:
+        new_count = count_assignments(hints + [candidates[-1]])
+        if new_count < count:
+            hints.append(candidates[-1])
+            count = new_count
+        candidates.pop()
+    for hint in rng.sample(hints, len(hints)):
+        remaining_hints = [other_hint for other_hint in hints if other_hint is not hint]
+        if count_assignments(remaining_hints, limit=2) == 1:
+            hints = remaining_hints
+    return hints
+
+def benchmark_puzzle_generation(puzzles: int = 200, seed: int = 0):
+    """
+    Prints the puzzles per second of generate_unique_puzzle, and of generating them by recounting every candidate 
+    hint list from scratch (see generate_unique_puzzle_by_counting).
+    """
+    print(f'unique puzzle generation, {puzzles} puzzles:')
+    rng = random.Random(seed)
+    hint_counts = []
+    session_time = time_call(lambda: hint_counts.extend(len(generate_unique_puzzle(rng)[0]) for _ in range(puzzles)), repeat=1)
+    print(f'  TowerSession: {puzzles / session_time:.0f} puzzles/s, {sum(hint_counts) / puzzles:.1f} hints per puzzle')
+    rng = random.Random(seed)
+    counting_time = time_call(lambda: [generate_unique_puzzle_by_counting(rng) for _ in range(puzzles)], repeat=1)
+    print(f'  count_assignments: {puzzles / counting_time:.0f} puzzles/s')
+
+BENCHMARKS = {
+    'absolute': benchmark_absolute_hints,
+    'generator': benchmark_puzzle_generation,
+    'orderings': benchmark_hint_orderings,
+    'memory': benchmark_memory,
+    'nodes': benchmark_node_counts,
+    'parallel': benchmark_parallel_split,
+    'profile': benchmark_search_profile,
+    'scaling': benchmark_schema_scaling,
+    'suite': benchmark_puzzle_suite,
+    'verify': benchmark_verification,
+}
+
+if __name__ == '__main__':
+    for name in [arg for arg in sys.argv[1:] if not arg.startswith('--')] or BENCHMARKS:
+        BENCHMARKS[name]()
@@ -1,7 +1,27 @@
 from enum import Enum, IntEnum
-from typing import List, Optional, Tuple, Union
-from dataclasses import dataclass
+from typing import Callable, Collection, Dict, Generator, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+import argparse
+import asyncio
+import atexit
+import contextlib
+import functools
+import hashlib
+import itertools
+import json
 import math
+import os
+import random
+import sqlite3
+import sys
+import time
+
+try:
+    import numpy as np
+except ImportError: # numpy is only needed by the vectorized engine
+    np = None
 
 class Floor(IntEnum):
     First = 1
@@ -34,8 +54,13 @@ class AttributeType(Enum):
     Color = 'Color'
     Animal = 'Animal'
 
-@dataclass
+@dataclass(frozen=True)
 class FloorAssignment:
+    """
+    The color and animal of a floor. Floor assignments are immutable and hashable, so equal ones can be shared:
+    make_floor_assignment returns a single interned instance for every (floor, color, animal).
+    """
+    __slots__ = ('floor', 'color', 'animal')
     floor: Floor
     color: Color
     animal: Animal
@@ -43,8 +68,310 @@ class FloorAssignment:
     def __contains__(self, value: Union[Floor, Color, Animal]):
         return value == self.floor or value == self.color or self.animal == value
 
+    def __reduce__(self):
+        # Frozen slotted instances can't have their state set by the default unpickling.
+        return FloorAssignment, (self.floor, self.color, self.animal)
+
+@functools.lru_cache(maxsize=None)
+def make_floor_assignment(floor: Floor, color: Color, animal: Animal) -> FloorAssignment:
+    """ Returns the interned floor assignment of the floor, color and animal (there are only 125 of them). """
+    return FloorAssignment(floor, color, animal)
+
+# Every attribute family of every schema gets a key when the schema is created, so attributes of all schemas have
+# distinct, sortable keys (see attribute_key), and VALUE_INDEX holds the index of every value in its family.
+FAMILY_KEYS: Dict[type, int] = {}
+VALUE_INDEX: Dict[Enum, int] = {}
+
+def is_floor(attribute) -> bool:
+    """
+    Floors are Floor members, or plain floor numbers in towers of more than five floors.
+    Members of other IntEnum families are ints too, but they're values of their family, not floors.
+    """
+    return isinstance(attribute, Floor) or (isinstance(attribute, int) and not isinstance(attribute, Enum))
+
+def make_floor(floor: int) -> Union[Floor, int]:
+    """ Returns the Floor member of the floor number, or the number itself if there's no such member. """
+    return Floor(floor) if MIN_FLOOR <= floor <= MAX_FLOOR else floor
+
+def attribute_key(attribute: Union[Floor, Color, Animal]) -> Tuple[int, int]:
+    """ Returns a sortable key of the attribute: floors first, then the families in the order their schemas were created. """
+    if is_floor(attribute):
+        return 0, int(attribute)
+    return FAMILY_KEYS[type(attribute)], VALUE_INDEX[attribute]
+
+@functools.lru_cache(maxsize=None)
+def make_family(name: str, value_names: Tuple[str, ...]) -> type:
+    """
+    Returns the Enum class of a family given by its name and value names. Schemas of equal families share the class,
+    so the families registered in FAMILY_KEYS don't grow with every schema that's created.
+    """
+    return Enum(name, [(value, value) for value in value_names])
+
+class TowerSchema(object):
+    """
+    The shape of a tower: the number of floors, and the attribute families that are spread over them, one value of
+    every family on every floor (so every family has as many values as there are floors).
+    Families are Enum classes, or (name, value names) pairs that an Enum class is made for (see make_family).
+    Hints of the tower refer to floors by their number (or Floor member), and to other attributes by the families' members.
+    """
+    def __init__(self, floor_count: int, families: Iterable[Union[type, Tuple[str, Iterable[str]]]]):
+        self.floor_count = floor_count
+        self.floors = range(MIN_FLOOR, floor_count + 1)
+        self.all_floors_mask = sum(1 << floor for floor in self.floors)
+        self.families = tuple(family if isinstance(family, type) else make_family(family[0], tuple(family[1]))
+                              for family in families)
+        self.family_index = {family: index for index, family in enumerate(self.families)}
+        self.family_members = [list(family) for family in self.families]
+        # The (family index, value index) of every value, so the search states find a value's slot in a single lookup.
+        self.value_slots = {value: (family_index, value_index) for family_index, family in enumerate(self.families)
+                            for value_index, value in enumerate(family)}
+        for family in self.families:
+            if len(family) != floor_count:
+                raise ValueError(f'{family.__name__} has {len(family)} values, but the tower has {floor_count} floors')
+            if family not in FAMILY_KEYS:
+                FAMILY_KEYS[family] = len(FAMILY_KEYS) + 1
+                VALUE_INDEX.update((value, index) for index, value in enumerate(family))
+
+    def family(self, name: str) -> type:
+        """ Returns the family with the given name. """
+        for family in self.families:
+            if family.__name__ == name:
+                return family
+        raise KeyError(name)
+
+    def floor_assignment(self, floor: int, values: Iterable[Enum]) -> Union[FloorAssignment, Tuple]:
+        """
+        Returns the assignment of a floor in this tower: a FloorAssignment in towers of colors and animals,
+        or a tuple of the floor and the value of every family otherwise.
+        """
+        if self.families == (Color, Animal):
+            return make_floor_assignment(make_floor(floor), *values)
+        return (floor, *values)
+
+# The tower of the puzzle: five floors, with a color and an animal on each one.
+DEFAULT_SCHEMA = TowerSchema(len(Floor), (Color, Animal))
+FAMILIES = DEFAULT_SCHEMA.families
+FAMILY_INDEX = DEFAULT_SCHEMA.family_index
+FAMILY_MEMBERS = DEFAULT_SCHEMA.family_members
+
+# Every way to spread the values of a family over the floors: PERMUTATIONS[p][v] is the floor of value v in the p'th one.
+PERMUTATIONS = list(itertools.permutations(range(MIN_FLOOR, MAX_FLOOR + 1)))
+PERMUTATION_FLOORS = np.array(PERMUTATIONS) if np is not None else None
+
+# Floors are encoded as bit number `floor` in the floor bitmasks.
+ALL_FLOORS_MASK = DEFAULT_SCHEMA.all_floors_mask
+
+def iter_bits(mask: int) -> Iterator[int]:
+    """ Yields the indices of the set bits of the given mask, lowest first. """
+    while mask:
+        lowest_bit = mask & -mask
+        yield lowest_bit.bit_length() - 1
+        mask ^= lowest_bit
+
+def shift_floors(mask: int, difference: int) -> int:
+    """
+    Moves every floor in the mask `difference` floors up (or down if negative).
+    Floors may be moved out of the tower, so the result should be intersected with a mask of floors in the tower.
+    """
+    if difference >= 0:
+        return mask << difference
+    return mask >> -difference
+
+class SearchState(object):
+    """
+    The mutable state of the backtracking search.
+    For every attribute family of the schema the state holds:
+    * positions: the floor every value of the family is placed on (0 if not placed yet), indexed by the value index.
+    * occupants: the index of the value placed on every floor (-1 if none yet), indexed by the floor.
+    * free_floors: a bitmask of the floors that don't have a value of the family yet.
+    * free_values: a bitmask of the value indices that weren't placed yet.
+    Placements are done and undone in place, so the search never copies the state.
+    Only the families in `counted_families` (all of them by default) are counted in the assignments that complete the
+    state, so families that are counted separately (see factorize_hints) can be left out.
+    """
+    __slots__ = ('schema', 'positions', 'occupants', 'free_floors', 'free_values', 'counted_families')
+
+    def __init__(self, counted_families: Optional[Tuple[int, ...]] = None, schema: TowerSchema = DEFAULT_SCHEMA):
+        self.schema = schema
+        self.counted_families = tuple(range(len(schema.families))) if counted_families is None else counted_families
+        self.positions = [[0] * len(family) for family in schema.families]
+        self.occupants = [[-1] * (schema.floor_count + 1) for _ in schema.families]
+        self.free_floors = [schema.all_floors_mask for _ in schema.families]
+        self.free_values = [(1 << len(family)) - 1 for family in schema.families]
+
+    def floor_of(self, attribute: Union[Floor, Color, Animal]) -> int:
+        """ Returns the floor of the given attribute, or 0 if it wasn't placed yet. """
+        if is_floor(attribute):
+            return int(attribute)
+        family_index, value_index = self.schema.value_slots[attribute]
+        return self.positions[family_index][value_index]
+
+    def candidate_floors(self, attribute: Union[Floor, Color, Animal]) -> int:
+        """ Returns a bitmask of the floors the given attribute may be on. """
+        if is_floor(attribute):
+            return 1 << int(attribute)
+        family_index, value_index = self.schema.value_slots[attribute]
+        floor = self.positions[family_index][value_index]
+        if floor:
+            return 1 << floor
+        return self.free_floors[family_index]
+
+    def can_place(self, attribute: Union[Floor, Color, Animal], floor: int) -> bool:
+        return bool(self.candidate_floors(attribute) & (1 << floor))
+
+    def place(self, attribute: Union[Floor, Color, Animal], floor: int) -> bool:
+        """
+        Places the attribute on the given floor, which must be one of its candidate floors.
+        Returns True if the state was changed (and the placement should be removed later on),
+        False if the attribute is a floor or was already placed there.
+        """
+        if is_floor(attribute):
+            return False
+        family_index, value_index = self.schema.value_slots[attribute]
+        if self.positions[family_index][value_index]:
+            return False
+        self.positions[family_index][value_index] = floor
+        self.occupants[family_index][floor] = value_index
+        self.free_floors[family_index] ^= 1 << floor
+        self.free_values[family_index] ^= 1 << value_index
+        return True
+
+    def remove(self, attribute: Union[Color, Animal]):
+        """ Undoes a placement done by `place`. """
+        family_index, value_index = self.schema.value_slots[attribute]
+        floor = self.positions[family_index][value_index]
+        self.positions[family_index][value_index] = 0
+        self.occupants[family_index][floor] = -1
+        self.free_floors[family_index] |= 1 << floor
+        self.free_values[family_index] |= 1 << value_index
+
+    def node_key(self, referenced_families: Collection[int]) -> Tuple[Optional[int], ...]:
+        """
+        Returns a hashable key of the floors left in the state, as seen by hints that only refer to values of the
+        referenced families (given by index): the floors left for those families. For the other families, only the
+        number of floors left matters (or nothing at all, if the family isn't counted).
+        The floors of the values the hints refer to complete the key (see _PendingHints).
+        """
+        return tuple(None if family_index not in self.counted_families 
+                     else free_floors if family_index in referenced_families 
+                     else bin(free_floors).count('1')
+                     for family_index, free_floors in enumerate(self.free_floors))
+
+    def placements(self) -> List[Tuple[Union[Color, Animal], int]]:
+        """ Returns the (attribute, floor) pairs placed so far. """
+        return [(self.schema.family_members[family_index][value_index], floor)
+                for family_index, positions in enumerate(self.positions)
+                for value_index, floor in enumerate(positions) if floor]
+
+    def iter_completions(self) -> Iterator[List[Union[FloorAssignment, Tuple]]]:
+        """
+        Yields every complete assignment that extends the state, where the values left of each family are placed
+        freely, as lists of floor assignments sorted by floor (see TowerSchema.floor_assignment).
+        """
+        family_members = self.schema.family_members
+        free_values = [[family_members[family_index][value_index] for value_index in iter_bits(self.free_values[family_index])]
+                       for family_index in range(len(family_members))]
+        free_floors = [list(iter_bits(free_floors)) for free_floors in self.free_floors]
+        for family_permutations in itertools.product(*(itertools.permutations(values) for values in free_values)):
+            floor_values = [[family_members[family_index][value_index] if value_index >= 0 else None for value_index in occupants]
+                            for family_index, occupants in enumerate(self.occupants)]
+            for family_index, permutation in enumerate(family_permutations):
+                for floor, value in zip(free_floors[family_index], permutation):
+                    floor_values[family_index][floor] = value
+            yield [self.schema.floor_assignment(floor, (values[floor] for values in floor_values)) for floor in self.schema.floors]
+
+    def count_completions(self) -> int:
+        """ Counts the assignments that extend the state, when the values left of each counted family are placed freely. """
+        completions = 1
+        for family_index in self.counted_families:
+            completions *= math.factorial(bin(self.free_values[family_index]).count('1'))
+        return completions
+
+class DomainState(object):
+    """
+    The state of the constraint propagation search: the bitmask of the floors every value may still be on,
+    indexed by family and value index.
+    """
+    __slots__ = ('schema', 'domains')
+
+    def __init__(self, domains: Optional[List[List[int]]] = None, schema: TowerSchema = DEFAULT_SCHEMA):
+        if domains is None:
+            domains = [[schema.all_floors_mask] * len(family) for family in schema.families]
+        self.schema = schema
+        self.domains = domains
+
+    def copy(self) -> 'DomainState':
+        return DomainState([list(family_domains) for family_domains in self.domains], self.schema)
+
+    def domain_of(self, attribute: Union[Floor, Color, Animal]) -> int:
+        if is_floor(attribute):
+            return 1 << int(attribute)
+        family_index, value_index = self.schema.value_slots[attribute]
+        return self.domains[family_index][value_index]
+
+    def set_domain(self, attribute: Union[Color, Animal], floors: int):
+        family_index, value_index = self.schema.value_slots[attribute]
+        self.domains[family_index][value_index] = floors
+
+    def propagate(self, hints: List['Hint']) -> bool:
+        """
+        Removes floors from the domains until every hint and the all-different rule of every family are consistent
+        with them (see Hint.restrict_domains and propagate_all_different).
+        Returns False as soon as a domain is empty, which means the state can't be completed.
+        """
+        changed = True
+        while changed:
+            changed = False
+            for hint in hints:
+                attr1, attr2 = hint.attributes
+                floors1, floors2 = self.domain_of(attr1), self.domain_of(attr2)
+                restricted_floors1, restricted_floors2 = hint.restrict_domains(floors1, floors2)
+                if not restricted_floors1 or not restricted_floors2:
+                    return False
+                # Floors never change here, as their single floor can only be restricted to nothing.
+                if restricted_floors1 != floors1:
+                    self.set_domain(attr1, restricted_floors1)
+                    changed = True
+                if restricted_floors2 != floors2:
+                    self.set_domain(attr2, restricted_floors2)
+                    changed = True
+            for family_domains in self.domains:
+                family_changed = propagate_all_different(family_domains, self.schema.all_floors_mask)
+                if family_changed is None:
+                    return False
+                changed = changed or family_changed
+        return True
+
+def propagate_all_different(domains: List[int], all_floors_mask: int = ALL_FLOORS_MASK) -> Optional[bool]:
+    """
+    Enforces that the values of a family are on different floors, on the domains of the family (in place):
+    * A value that is left with a single floor takes it from all the other values.
+    * A floor that only a single value may be on, is that value's floor (a hidden single).
+    Returns whether a domain was changed, or None if a domain (or a floor) was left without options.
+    """
+    changed = False
+    for value_index, floors in enumerate(domains):
+        if floors & (floors - 1) == 0:
+            for other_index, other_floors in enumerate(domains):
+                if other_index != value_index and other_floors & floors:
+                    other_floors &= ~floors
+                    if not other_floors:
+                        return None
+                    domains[other_index] = other_floors
+                    changed = True
+    for floor in iter_bits(all_floors_mask):
+        floor_bit = 1 << floor
+        holders = [value_index for value_index, floors in enumerate(domains) if floors & floor_bit]
+        if not holders:
+            return None
+        if len(holders) == 1 and domains[holders[0]] != floor_bit:
+            domains[holders[0]] = floor_bit
+            changed = True
+    return changed
+
 class Hint(object): 
     """Base class for all the hint classes"""
+    __slots__ = ('_attr1', '_attr2', '_signature')
 
     def check_if_satisfied(self, floor_assignments: List[FloorAssignment]) -> bool:
         """ Checks if the hint is satisfied in the given floor assignments. """
@@ -61,6 +388,81 @@ class Hint(object):
         """
         ...
 
+    @property
+    def signature(self) -> Tuple:
+        """ A hashable, sortable description of the hint, computed once as hints are hashed and compared a lot. """
+        try:
+            return self._signature
+        except AttributeError:
+            self._signature = self._make_signature()
+            return self._signature
+
+    def _make_signature(self) -> Tuple:
+        return type(self).__name__, attribute_key(self._attr1), attribute_key(self._attr2)
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Hint) and self.signature == other.signature
+
+    def __hash__(self) -> int:
+        return hash(self.signature)
+
+    def __reduce__(self):
+        # Hints are pickled as their signature, which is much smaller than the pickled enum members.
+        return hint_from_signature, (self.signature,)
+
+    def normalized(self, schema: TowerSchema = DEFAULT_SCHEMA) -> Optional[List['Hint']]:
+        """
+        Rewrites the hint in canonical form, so equivalent hints become equal, in a tower of the given schema.
+        Returns a list of the canonical hints: an empty list if the hint always holds, or None if it never does.
+        """
+        ...
+
+    @property
+    def attributes(self) -> Tuple[Union[Floor, Color, Animal], Union[Floor, Color, Animal]]:
+        return self._attr1, self._attr2
+
+    def floors_match(self, floor1, floor2):
+        """
+        Checks if the hint holds when its first attribute is on floor1 and its second attribute on floor2.
+        Works on plain floor numbers as well as on numpy arrays of floors (element-wise).
+        """
+        ...
+
+    def floors_match_source(self, floor1: str, floor2: str) -> str:
+        """
+        Returns the source of a Python expression that is floors_match of the given expressions of the floors
+        (see compile_hints).
+        """
+        ...
+
+    def restrict_domains(self, floors1: int, floors2: int) -> Tuple[int, int]:
+        """
+        Given bitmasks of the floors each attribute may be on, returns them without the floors
+        that can't satisfy the hint with any floor of the other attribute.
+        """
+        ...
+
+    def is_anchored(self, state: SearchState) -> bool:
+        """ Checks if one of the hint's attributes is a floor or was already placed. """
+        return bool(state.floor_of(self._attr1) or state.floor_of(self._attr2))
+
+    def count_possible_placements(self, state: SearchState) -> int:
+        """ Returns the number of floor pairs get_possible_placements would yield. """
+        return sum(1 for _ in self.get_possible_placements(state))
+
+    def check_if_satisfied_by_state(self, state: SearchState) -> bool:
+        """ Checks if the hint is satisfied by the placements of the given search state. """
+        floor1 = state.floor_of(self._attr1)
+        floor2 = state.floor_of(self._attr2)
+        return bool(floor1 and floor2) and self.floors_match(floor1, floor2)
+
+    def get_possible_placements(self, state: SearchState) -> Iterator[Tuple[int, int]]:
+        """
+        Yields all possible (floor of first attribute, floor of second attribute) pairs that satisfy the hint,
+        given the candidate floors of both attributes in the search state.
+        """
+        ...
+
 
 def find_floor_assignment_by_attribute(attribute: Union[Floor, Color, Animal], floor_assignments: List[FloorAssignment]) -> Optional[FloorAssignment]:
     floor_assignment_with_attribute = list(filter(lambda x: attribute in x, floor_assignments))
@@ -89,6 +491,8 @@ class RelativeHint(Hint):
     The third floor is two floors below the fifth floor:
         RelativeHint(Floor.Third, Floor.Fifth, -2)
     """
+    __slots__ = ('_difference',)
+
     def __init__(self, 
                  attr1: Union[Floor, Color, Animal], 
                  attr2: Union[Floor, Color, Animal],
@@ -115,6 +519,49 @@ class RelativeHint(Hint):
                 return Floor(new_floor) in floor_assignment_with_attr1
 
         return False
+
+    def _make_signature(self) -> Tuple:
+        return super()._make_signature() + (self._difference,)
+
+    def floors_match(self, floor1, floor2):
+        return floor1 == floor2 + self._difference
+
+    def floors_match_source(self, floor1: str, floor2: str) -> str:
+        return f'{floor1} == {floor2} + {int(self._difference)}'
+
+    def restrict_domains(self, floors1: int, floors2: int) -> Tuple[int, int]:
+        floors1 &= shift_floors(floors2, self._difference)
+        return floors1, floors2 & shift_floors(floors1, -self._difference)
+
+    def normalized(self, schema: TowerSchema = DEFAULT_SCHEMA) -> Optional[List[Hint]]:
+        """
+        A relative hint with no difference is an absolute hint, and one with a negative difference is the reversed
+        hint with a positive difference. A relative hint to a floor is an absolute hint on the floor it points to.
+        """
+        if self._difference == 0:
+            return AbsoluteHint(self._attr1, self._attr2).normalized(schema)
+        if self._difference < 0:
+            return RelativeHint(self._attr2, self._attr1, -self._difference).normalized(schema)
+        if self._difference > schema.floor_count - MIN_FLOOR or self._attr1 == self._attr2:
+            return None
+        if is_floor(self._attr2):
+            floor = int(self._attr2) + self._difference
+            return AbsoluteHint(self._attr1, make_floor(floor)).normalized(schema) if floor <= schema.floor_count else None
+        if is_floor(self._attr1):
+            floor = int(self._attr1) - self._difference
+            return AbsoluteHint(make_floor(floor), self._attr2).normalized(schema) if floor >= MIN_FLOOR else None
+        return [self]
+
+    def get_possible_placements(self, state: SearchState) -> Iterator[Tuple[int, int]]:
+        """ The first attribute must be `difference` floors above the second one. """
+        for floor1 in iter_bits(self._possible_floors1(state)):
+            yield floor1, floor1 - self._difference
+
+    def count_possible_placements(self, state: SearchState) -> int:
+        return bin(self._possible_floors1(state)).count('1')
+
+    def _possible_floors1(self, state: SearchState) -> int:
+        return state.candidate_floors(self._attr1) & shift_floors(state.candidate_floors(self._attr2), self._difference)
     
     def get_options_if_valid(self, options: Union[List[Color], List[Animal], List[Floor]], floor_assignments: List[FloorAssignment]) -> GetOptionsIfValidReturnType:
         if self._attr1 in options:
@@ -124,7 +571,7 @@ class RelativeHint(Hint):
 
             new_floor = floor_assignment_with_attr1.floor.value - self._difference
             if new_floor <= MAX_FLOOR and new_floor >= MIN_FLOOR:
-                return GetOptionsIfValidReturnType(False, [], [(None, [AbsoluteHint(Floor(new_floor), self._attr2 )])])
+                return GetOptionsIfValidReturnType(False, [], [(None, [derived_absolute_hint(Floor(new_floor), self._attr2)])])
             return GetOptionsIfValidReturnType(False, [], [])
         else:
             return GetOptionsIfValidReturnType(False, [], [])
@@ -167,19 +614,18 @@ class RelativeHint(Hint):
             
         possible_options = []
         for floor in floor_options:
+            new_floor = floor.value + self._difference
+
+            # out of bounds, is not a possibility
+            if new_floor > MAX_FLOOR or new_floor < MIN_FLOOR:
+                continue
+
+            new_hint_to_satisfy = derived_absolute_hint(Floor(new_floor), self._attr2)
             for animal in animal_options:
                 for color in color_options:
-                    new_floor = floor.value + self._difference
-                    
-                    # out of bounds, is not a possibility
-                    if new_floor > MAX_FLOOR or new_floor < MIN_FLOOR:
-                        continue
-
-                    new_hint_to_satisfy = AbsoluteHint(Floor(new_floor), self._attr2)
-                    
                     # return it as a possibility, but return the new hint as well:
-                    possible_options.append((FloorAssignment(floor=floor, color=color, animal=animal), [new_hint_to_satisfy]))
-                        
+                    possible_options.append((make_floor_assignment(floor, color, animal), [new_hint_to_satisfy]))
+
 
         return possible_options
 
@@ -193,6 +639,8 @@ class AbsoluteHint(Hint):
     The orange floor is the floor where the chicken lives:
         AbsoluteHint(Color.Orange, Animal.Chicken)
     """
+    __slots__ = ()
+
     def __init__(self, attr1: Union[Floor, Color, Animal], attr2: Union[Floor, Color, Animal]): # Reminder: Don't change the initializer signature
         self._attr1 = attr1
         self._attr2 = attr2
@@ -207,6 +655,37 @@ class AbsoluteHint(Hint):
                 return True
         return False
 
+    def floors_match(self, floor1, floor2):
+        return floor1 == floor2
+
+    def floors_match_source(self, floor1: str, floor2: str) -> str:
+        return f'{floor1} == {floor2}'
+
+    def restrict_domains(self, floors1: int, floors2: int) -> Tuple[int, int]:
+        return floors1 & floors2, floors1 & floors2
+
+    def normalized(self, schema: TowerSchema = DEFAULT_SCHEMA) -> Optional[List[Hint]]:
+        """
+        The attributes of an absolute hint are sorted. An attribute is always on its own floor, and two different
+        attributes of the same type (two floors, two colors or two animals) are never on the same floor.
+        """
+        attr1, attr2 = sorted(self.attributes, key=attribute_key)
+        if attribute_key(attr1) == attribute_key(attr2):
+            return []
+        if attribute_key(attr1)[0] == attribute_key(attr2)[0]:
+            return None
+        if (attr1, attr2) == self.attributes:
+            return [self]
+        return [AbsoluteHint(attr1, attr2)]
+
+    def get_possible_placements(self, state: SearchState) -> Iterator[Tuple[int, int]]:
+        """ Both attributes must be on the same floor. """
+        for floor in iter_bits(state.candidate_floors(self._attr1) & state.candidate_floors(self._attr2)):
+            yield floor, floor
+
+    def count_possible_placements(self, state: SearchState) -> int:
+        return bin(state.candidate_floors(self._attr1) & state.candidate_floors(self._attr2)).count('1')
+
     def get_possible_floor_assignments(self, 
                                        empty_floors: List[Floor], 
                                        all_animal_options: List[Animal], 
@@ -261,7 +740,7 @@ class AbsoluteHint(Hint):
         for floor in floor_options:
             for animal in animal_options:
                 for color in color_options:
-                    possible_options.append((FloorAssignment(floor=floor, color=color, animal=animal), []))
+                    possible_options.append((make_floor_assignment(floor, color, animal), []))
         return possible_options
 
 class NeighborHint(Hint):
@@ -276,6 +755,8 @@ class NeighborHint(Hint):
     The yellow floor is neighboring the third floor:
         NeighborHint(Color.Yellow, Floor.Third)
     """
+    __slots__ = ('relative_hints',)
+
     def __init__(self, attr1: Union[Floor, Color, Animal], attr2: Union[Floor, Color, Animal]): # Reminder: Don't change the initializer signature
         self._attr1 = attr1
         self._attr2 = attr2
@@ -293,6 +774,41 @@ class NeighborHint(Hint):
                 return True
         return False
 
+    def floors_match(self, floor1, floor2):
+        return abs(floor1 - floor2) == 1
+
+    def floors_match_source(self, floor1: str, floor2: str) -> str:
+        return f'abs({floor1} - {floor2}) == 1'
+
+    def restrict_domains(self, floors1: int, floors2: int) -> Tuple[int, int]:
+        floors1 &= shift_floors(floors2, 1) | shift_floors(floors2, -1)
+        return floors1, floors2 & (shift_floors(floors1, 1) | shift_floors(floors1, -1))
+
+    def normalized(self, schema: TowerSchema = DEFAULT_SCHEMA) -> Optional[List[Hint]]:
+        """
+        The attributes of a neighbor hint are sorted. An attribute is never its own neighbor, and a neighbor
+        of the top or bottom floor has to be on the single floor next to it.
+        """
+        attr1, attr2 = sorted(self.attributes, key=attribute_key)
+        if attribute_key(attr1) == attribute_key(attr2):
+            return None
+        if is_floor(attr2):
+            return [] if self.floors_match(int(attr1), int(attr2)) else None
+        if is_floor(attr1):
+            neighbor_floors = [floor for floor in (int(attr1) - 1, int(attr1) + 1) if MIN_FLOOR <= floor <= schema.floor_count]
+            if len(neighbor_floors) == 1:
+                return AbsoluteHint(make_floor(neighbor_floors[0]), attr2).normalized(schema)
+        if (attr1, attr2) == self.attributes:
+            return [self]
+        return [NeighborHint(attr1, attr2)]
+
+    def get_possible_placements(self, state: SearchState) -> Iterator[Tuple[int, int]]:
+        """ The attributes must be on adjacent floors, in either direction. """
+        floors2 = state.candidate_floors(self._attr2)
+        for floor1 in iter_bits(state.candidate_floors(self._attr1)):
+            for floor2 in iter_bits(floors2 & ((1 << (floor1 + 1)) | (1 << (floor1 - 1)))):
+                yield floor1, floor2
+
     def get_possible_floor_assignments(self, 
                                        empty_floors: List[Floor], 
                                        all_animal_options: List[Animal], 
@@ -308,72 +824,1484 @@ class NeighborHint(Hint):
                                                                      all_animal_options, 
                                                                      all_color_options, 
                                                                      floor_assignments) \
-                + self.relative_hints[0].get_possible_floor_assignments(empty_floors, 
+                + self.relative_hints[1].get_possible_floor_assignments(empty_floors, 
                                                                         all_animal_options, 
                                                                         all_color_options, 
                                                                         floor_assignments)
 
+@functools.lru_cache(maxsize=None)
+def derived_absolute_hint(floor: Floor, attribute: Union[Floor, Color, Animal]) -> AbsoluteHint:
+    """
+    Returns the AbsoluteHint the list based API derives from a RelativeHint once its first attribute is placed.
+    There are few of them, so they are built once and shared instead of being allocated on every expansion.
+    """
+    return AbsoluteHint(floor, attribute)
+
+HINT_TYPES = {hint_type.__name__: hint_type for hint_type in (AbsoluteHint, RelativeHint, NeighborHint)}
+
+def attribute_from_key(key: Tuple[int, int]) -> Union[Floor, Color, Animal]:
+    """ Returns the attribute with the given key (see attribute_key). """
+    family_key, index = key
+    if family_key == 0:
+        return make_floor(index)
+    return _FAMILIES_BY_KEY[family_key][index]
+
+_FAMILIES_BY_KEY: Dict[int, List[Enum]] = {}
+
+def hint_from_signature(signature: Tuple) -> Hint:
+    """ Creates the hint described by the given signature (see Hint.signature). """
+    hint_type, key1, key2, *arguments = signature
+    if len(_FAMILIES_BY_KEY) != len(FAMILY_KEYS):
+        _FAMILIES_BY_KEY.update((family_key, list(family)) for family, family_key in FAMILY_KEYS.items())
+    return HINT_TYPES[hint_type](attribute_from_key(key1), attribute_from_key(key2), *arguments)
+
+SearchTrace = Callable[[str, int, Optional['Hint']], None]
+
+@dataclass
+class SearchStats:
+    """
+    Statistics of a search, filled in by the engines when given (without stats, the engines skip all of this):
+    nodes - the search nodes expanded.
+    branches - the branches taken, by the type name of the hint they place (the backtracking engine only).
+    placement_checks - the possible floor pairs of the expanded hints that were checked against the search state
+        (the counterpart of the check_if_satisfied calls of the list based API), of which `branches` were taken.
+    dead_ends - the nodes that had hints left to satisfy, but no branch to take (or whose domains ran out).
+    max_depth - the most hints expanded (or domains branched on) along a single search path.
+    cache_hits, cache_misses - the lookups of search nodes in the transposition cache.
+    phase_times - the wall time of every phase of count_assignments, in seconds: 'normalize', 'factorize' and 'search'.
+    If a trace callback is given, it's called with ('expand', depth, hint) when a node branches on a hint,
+    ('dead_end', depth, hint) when it had no branch to take, and ('cache_hit', depth, None).
+    """
+    nodes: int = 0
+    branches: Dict[str, int] = field(default_factory=dict)
+    placement_checks: int = 0
+    dead_ends: int = 0
+    max_depth: int = 0
+    cache_hits: int = 0
+    cache_misses: int = 0
+    phase_times: Dict[str, float] = field(default_factory=dict)
+    trace: Optional[SearchTrace] = field(default=None, repr=False, compare=False)
+
+    def add_phase_time(self, phase: str, start_time: float):
+        """ Adds the wall time since start_time (a time.perf_counter() value) to the phase. """
+        self.phase_times[phase] = self.phase_times.get(phase, 0.0) + time.perf_counter() - start_time
+
+class TranspositionCache(object):
+    """
+    A cache of sub-search counts, so search nodes that are reached more than once are only counted once.
+    Nodes are keyed by the set of hints left to satisfy and the placements relevant to them
+    (see _PendingHints and SearchState.node_key), so the key doesn't depend on the order the placements were made in.
+    When max_size is given, the least recently used counts are evicted, and the numbers of the hints in the keys
+    are bounded too (see open_search).
+    """
+    def __init__(self, max_size: Optional[int] = None):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._counts = OrderedDict()
+        self._hint_ids = {}
+        self._open_searches = 0
+
+    def open_search(self, hint_keys: List[Tuple]) -> List[int]:
+        """
+        Starts a search of the hints with the given keys on this cache, and returns the bit numbers of the hints in
+        the bitmasks of pending hints of its keys (see Backtracker), numbering the hints in the order they're first seen.
+        When max_size is given and numbering new hints would make more than max_size of them, the cache is cleared
+        first, unless another search is still open (their keys use the current numbers).
+        Every search that was opened must be closed with close_search.
+        """
+        if self.max_size is not None and not self._open_searches:
+            new_keys = set(hint_keys).difference(self._hint_ids)
+            if new_keys and len(self._hint_ids) + len(new_keys) > self.max_size:
+                self._counts.clear()
+                self._hint_ids.clear()
+        self._open_searches += 1
+        return [self._hint_ids.setdefault(hint_key, len(self._hint_ids)) for hint_key in hint_keys]
+
+    def close_search(self):
+        """ Ends a search started with open_search. """
+        self._open_searches -= 1
+
+    def __len__(self) -> int:
+        return len(self._counts)
+
+    def get(self, key: Tuple) -> Optional[int]:
+        count = self._counts.get(key)
+        if count is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._counts.move_to_end(key)
+        return count
+
+    def put(self, key: Tuple, count: int):
+        self._counts[key] = count
+        self._counts.move_to_end(key)
+        if self.max_size is not None:
+            while len(self._counts) > self.max_size:
+                self._counts.popitem(last=False)
+
+def apply_possible_placements(hint: Hint, state: SearchState, stats: Optional[SearchStats] = None) -> Iterator[None]:
+    """
+    Places the hint's attributes on each of its possible floor pairs in turn, and yields while they are placed.
+    The placements are removed from the state when the generator is resumed, or closed.
+    The floor pairs checked are counted in the stats, if given.
+    """
+    attr1, attr2 = hint.attributes
+    for floor1, floor2 in hint.get_possible_placements(state):
+        if stats is not None:
+            stats.placement_checks += 1
+        if not state.can_place(attr1, floor1):
+            continue
+        placed1 = state.place(attr1, floor1)
+        try:
+            if state.can_place(attr2, floor2):
+                placed2 = state.place(attr2, floor2)
+                try:
+                    yield
+                finally:
+                    if placed2:
+                        state.remove(attr2)
+        finally:
+            if placed1:
+                state.remove(attr1)
+
+HintOrdering = Callable[[List[Hint], int, SearchState], int]
+
+def order_in_sequence(hints: List[Hint], pending: int, state: SearchState) -> int:
+    """ A hint ordering that expands the pending hints in the order of the hint list. """
+    return (pending & -pending).bit_length() - 1
+
+def order_most_constrained(hints: List[Hint], pending: int, state: SearchState) -> int:
+    """
+    A hint ordering that expands the pending hint with the fewest possible placements first.
+    Between hints with as many placements, anchored hints (that have a placed attribute) go first,
+    so unanchored Neighbor and Relative hints are deferred until an attribute of theirs is placed.
+    The scan stops at the first hint that has no placements, or a single one and is anchored: only a hint without
+    placements could come before that one, and it's still found a level deeper. So repeated hints, which have a single
+    placement once a copy of theirs was expanded, keep the scans of long hint lists short.
+    """
+    best_hint_index, best_key = -1, None
+    for hint_index in iter_bits(pending):
+        hint = hints[hint_index]
+        placements = hint.count_possible_placements(state)
+        if placements == 0:
+            return hint_index
+        key = (placements, not hint.is_anchored(state))
+        if key == (1, False):
+            return hint_index
+        if best_key is None or key < best_key:
+            best_hint_index, best_key = hint_index, key
+    return best_hint_index
+
+HINT_ORDERINGS: Dict[str, HintOrdering] = {
+    'in_order': order_in_sequence,
+    'most_constrained': order_most_constrained,
+}
+
+class _SearchFrame(object):
+    """
+    A node of the backtracking search on the explicit stack of Backtracker: the hint it branches on, the floor pairs of
+    the hint left to try, and the count of the branches done so far.
+    trail_mark is the length of the trail when the node was entered, so undoing its current branch
+    is removing the placements on the trail above it.
+    """
+    __slots__ = ('hint_index', 'hint', 'placements', 'trail_mark', 'count', 'limit', 'node_key', 'depth', 'branches')
+
+    def __init__(self, hint_index: int, hint: Hint, placements: Iterator[Tuple[int, int]], trail_mark: int, 
+                 limit: Optional[int], node_key: Optional[Tuple], depth: int):
+        self.hint_index = hint_index
+        self.hint = hint
+        self.placements = placements
+        self.trail_mark = trail_mark
+        self.count = 0
+        self.limit = limit
+        self.node_key = node_key
+        self.depth = depth
+        self.branches = 0
+
+class _PendingHints(object):
+    """
+    What the cache keys of the Backtracker's search nodes need to know about the pending hints, kept up to date as
+    hints are expanded and restored and values are placed and removed, so keying a node takes no work in the number
+    of hints or values:
+    hint_mask - a bitmask of the cache ids of the pending hints (which are distinct, see Backtracker.distinct_pending).
+    families - the indices of the families of the non-floor attributes the pending hints refer to.
+    placed - the floors of the placed values the pending hints refer to, by (family index, value index) slot.
+        The values the pending hints refer to that aren't in it are free.
+    They're derived from the number of pending hints that refer to every slot and family.
+    """
+    __slots__ = ('hint_mask', 'placed', '_hint_ids', '_hint_slots', '_value_slots', '_positions', '_slot_refs', 
+                 '_family_refs', '_families')
+
+    def __init__(self, hint_ids: List[int], hint_slots: List[Tuple[Tuple[int, int], ...]], state: SearchState):
+        self.hint_mask = 0
+        self.placed = {}
+        self._hint_ids = hint_ids
+        self._hint_slots = hint_slots
+        self._value_slots = state.schema.value_slots
+        self._positions = state.positions
+        self._slot_refs = {}
+        self._family_refs = [0] * len(state.positions)
+        self._families = frozenset()
+
+    def add(self, hint_index: int):
+        """ Makes a hint pending. """
+        self.hint_mask |= 1 << self._hint_ids[hint_index]
+        for slot in self._hint_slots[hint_index]:
+            refs = self._slot_refs[slot] = self._slot_refs.get(slot, 0) + 1
+            if refs == 1:
+                family_index, value_index = slot
+                floor = self._positions[family_index][value_index]
+                if floor:
+                    self.placed[slot] = floor
+                self._family_refs[family_index] += 1
+                if self._family_refs[family_index] == 1:
+                    self._families = None
+
+    def remove(self, hint_index: int):
+        """ Makes a pending hint no longer pending. """
+        self.hint_mask &= ~(1 << self._hint_ids[hint_index])
+        for slot in self._hint_slots[hint_index]:
+            refs = self._slot_refs[slot] = self._slot_refs[slot] - 1
+            if refs == 0:
+                self.placed.pop(slot, None)
+                family_index = slot[0]
+                self._family_refs[family_index] -= 1
+                if self._family_refs[family_index] == 0:
+                    self._families = None
+
+    def place(self, attribute: Union[Color, Animal], floor: int):
+        """ Notes that a value was placed on the floor. """
+        slot = self._value_slots[attribute]
+        if self._slot_refs.get(slot):
+            self.placed[slot] = floor
+
+    def unplace(self, attribute: Union[Color, Animal]):
+        """ Notes that a value was removed from its floor. """
+        self.placed.pop(self._value_slots[attribute], None)
+
+    @property
+    def families(self) -> frozenset:
+        if self._families is None:
+            self._families = frozenset(family_index for family_index, refs in enumerate(self._family_refs) if refs)
+        return self._families
+
+class Backtracker(object):
+    """
+    The backtracking search over a list of hints.
+    The hints left to satisfy at a search node are a bitmask over the hint list (bit i for hints[i]), and the ordering
+    picks the pending hint to expand next. Every hint is satisfied by placing its attributes on one of its possible
+    floor pairs.
+    The search doesn't recurse: the path from the root to the current node is an explicit stack of frames
+    (see _SearchFrame), and the placements along it are kept on a trail, which is cut back to undo a branch. So the
+    memory the search takes is linear in the number of hints, and there's no limit on their number.
+    Repeated hints are only searched once (see distinct_pending).
+    Counts of search nodes are stored in the cache, if given, keyed by the set of the pending hints (a bitmask of
+    the hints' ids in the cache, see TranspositionCache.open_search) and the placements relevant to them
+    (see _PendingHints).
+    """
+    def __init__(self, 
+                 hints: List[Hint], 
+                 cache: Optional[TranspositionCache] = None, 
+                 stats: Optional[SearchStats] = None,
+                 ordering: HintOrdering = order_most_constrained):
+        self.hints = hints
+        self.cache = cache
+        self.stats = stats
+        self.ordering = ordering
+        self._hint_ids = None
+
+    def _record_node(self, depth: int):
+        """ Counts a search node at the given depth (the number of hints expanded above it) in the stats. """
+        self.stats.nodes += 1
+        if depth > self.stats.max_depth:
+            self.stats.max_depth = depth
+
+    def _record_branches(self, hint: Hint, depth: int, branches: int):
+        """ Counts the branches a node took on the hint in the stats. """
+        hint_type = type(hint).__name__
+        self.stats.branches[hint_type] = self.stats.branches.get(hint_type, 0) + branches
+        if branches == 0:
+            self.stats.dead_ends += 1
+        if self.stats.trace is not None:
+            self.stats.trace('expand' if branches else 'dead_end', depth, hint)
+
+    def distinct_pending(self, pending: int) -> int:
+        """
+        Returns the pending hints without the repeats of hints that are pending already: they don't change which
+        assignments satisfy the hints, and would only add a level to the search for every repeat.
+        """
+        signatures = set()
+        repeats = 0
+        for hint_index in iter_bits(pending):
+            signature = self.hints[hint_index].signature
+            if signature in signatures:
+                repeats |= 1 << hint_index
+            signatures.add(signature)
+        return pending & ~repeats
+
+    def pending_hints(self, pending: int, state: SearchState) -> _PendingHints:
+        """ Returns the _PendingHints of the pending hints, for the cache keys of a search from them and the state. """
+        value_slots = state.schema.value_slots
+        hint_slots = [tuple(value_slots[attribute] for attribute in hint.attributes if not is_floor(attribute)) 
+                      for hint in self.hints]
+        pending_hints = _PendingHints(self._hint_ids, hint_slots, state)
+        for hint_index in iter_bits(pending):
+            pending_hints.add(hint_index)
+        return pending_hints
+
+    def _enter(self, state: SearchState, pending: int, limit: Optional[int], frames: List[_SearchFrame], trail: List, 
+               cache: Optional[TranspositionCache], pending_hints: Optional[_PendingHints]) -> Optional[int]:
+        """
+        Enters a search node: returns its count right away if it's a leaf or its count is in the cache (if given),
+        or pushes a frame for it and returns None. The hint of the frame is no longer pending in pending_hints.
+        """
+        stats = self.stats
+        depth = len(frames)
+        if stats is not None:
+            self._record_node(depth)
+        if not pending:
+            completions = state.count_completions()
+            return completions if limit is None else min(completions, limit)
+
+        node_key = None
+        if cache is not None:
+            node_key = (pending_hints.hint_mask, state.node_key(pending_hints.families), 
+                        frozenset(pending_hints.placed.items()))
+            cached_count = cache.get(node_key)
+            if stats is not None:
+                if cached_count is None:
+                    stats.cache_misses += 1
+                else:
+                    stats.cache_hits += 1
+                    if stats.trace is not None:
+                        stats.trace('cache_hit', depth, None)
+            if cached_count is not None:
+                return cached_count if limit is None else min(cached_count, limit)
+
+        hint_index = self.ordering(self.hints, pending, state)
+        hint = self.hints[hint_index]
+        if cache is not None:
+            pending_hints.remove(hint_index)
+        frames.append(_SearchFrame(hint_index, hint, hint.get_possible_placements(state), len(trail), limit, node_key, depth))
+        return None
+
+    def _undo(self, state: SearchState, trail: List, trail_mark: int, pending_hints: Optional[_PendingHints]):
+        """ Removes the placements on the trail above the mark. """
+        while len(trail) > trail_mark:
+            attribute = trail.pop()
+            state.remove(attribute)
+            if pending_hints is not None:
+                pending_hints.unplace(attribute)
+
+    def _next_branch(self, state: SearchState, frame: _SearchFrame, trail: List, 
+                     pending_hints: Optional[_PendingHints]) -> bool:
+        """
+        Undoes the frame's current branch, and places the hint's attributes on the next possible floor pair.
+        Returns False if there are no floor pairs left.
+        """
+        self._undo(state, trail, frame.trail_mark, pending_hints)
+        attr1, attr2 = frame.hint.attributes
+        for floor1, floor2 in frame.placements:
+            if self.stats is not None:
+                self.stats.placement_checks += 1
+            if not state.can_place(attr1, floor1):
+                continue
+            if state.place(attr1, floor1):
+                trail.append(attr1)
+                if pending_hints is not None:
+                    pending_hints.place(attr1, floor1)
+            if state.can_place(attr2, floor2):
+                if state.place(attr2, floor2):
+                    trail.append(attr2)
+                    if pending_hints is not None:
+                        pending_hints.place(attr2, floor2)
+                frame.branches += 1
+                return True
+            self._undo(state, trail, frame.trail_mark, pending_hints)
+        return False
+
+    def _leave(self, state: SearchState, frames: List[_SearchFrame], trail: List, cache: Optional[TranspositionCache], 
+               pending_hints: Optional[_PendingHints], complete: bool) -> _SearchFrame:
+        """
+        Pops the top frame, undoing its placements, and returns it. Its hint is pending again in pending_hints.
+        Complete counts are stored in the cache.
+        """
+        frame = frames.pop()
+        self._undo(state, trail, frame.trail_mark, pending_hints)
+        if self.stats is not None:
+            self._record_branches(frame.hint, frame.depth, frame.branches)
+        if cache is not None:
+            pending_hints.add(frame.hint_index)
+            if complete:
+                cache.put(frame.node_key, frame.count)
+        return frame
+
+    def count(self, state: SearchState, pending: int, limit: Optional[int] = None) -> int:
+        """
+        Counts all possible assignments that extend the search state and satisfy the pending hints.
+        If a limit is given, the search stops as soon as `limit` assignments were found, and the count is at most `limit`.
+        The state is left as it was given.
+        """
+        return _run_steps(self.count_in_steps(state, pending, limit))
+
+    def count_in_steps(self, state: SearchState, pending: int, limit: Optional[int] = None,
+                       step_nodes: Optional[int] = None) -> Generator[int, None, int]:
+        """
+        Counts like count, but every `step_nodes` search nodes (if given) yields the number of nodes entered so far,
+        so the search can be interleaved with other work. The count is returned when the generator finishes.
+        Closing the generator before that abandons the search, and restores the state.
+        """
+        cache = self.cache
+        frames = []
+        trail = []
+        pending = self.distinct_pending(pending)
+        pending_hints = None
+        if cache is not None:
+            # The ids of the hints can't change while the search is open, so every open search of the backtracker
+            # has the same ids.
+            self._hint_ids = cache.open_search([hint.signature for hint in self.hints])
+        nodes = 1
+        next_step = step_nodes
+        try:
+            if cache is not None:
+                pending_hints = self.pending_hints(pending, state)
+            count = self._enter(state, pending, limit, frames, trail, cache, pending_hints)
+            if count is None:
+                pending &= ~(1 << frames[-1].hint_index)
+            while frames:
+                frame = frames[-1]
+                if count is not None:
+                    # The count of the child node of the frame's current branch.
+                    frame.count += count
+                    count = None
+                    if frame.limit is not None and frame.count == frame.limit:
+                        count = self._leave(state, frames, trail, cache, pending_hints, complete=False).count
+                        pending |= 1 << frame.hint_index
+                        continue
+                if not self._next_branch(state, frame, trail, pending_hints):
+                    count = self._leave(state, frames, trail, cache, pending_hints, complete=True).count
+                    pending |= 1 << frame.hint_index
+                    continue
+                if nodes == next_step:
+                    next_step += step_nodes
+                    yield nodes
+                nodes += 1
+                child_limit = None if frame.limit is None else frame.limit - frame.count
+                count = self._enter(state, pending, child_limit, frames, trail, cache, pending_hints)
+                if count is None:
+                    pending &= ~(1 << frames[-1].hint_index)
+        finally:
+            while trail:
+                state.remove(trail.pop())
+            if cache is not None:
+                cache.close_search()
+        return count
+
+    def iter_assignments(self, state: SearchState, pending: int) -> Iterator[List[FloorAssignment]]:
+        """ Lazily yields all the complete assignments that extend the search state and satisfy the pending hints. """
+        # Every assignment is enumerated, so the cache isn't used.
+        pending = self.distinct_pending(pending)
+        frames = []
+        trail = []
+        try:
+            if self._enter(state, pending, None, frames, trail, None, None) is not None:
+                yield from state.iter_completions()
+            else:
+                pending &= ~(1 << frames[-1].hint_index)
+            while frames:
+                frame = frames[-1]
+                if not self._next_branch(state, frame, trail, None):
+                    self._leave(state, frames, trail, None, None, complete=False)
+                    pending |= 1 << frame.hint_index
+                    continue
+                if self._enter(state, pending, None, frames, trail, None, None) is not None:
+                    yield from state.iter_completions()
+                else:
+                    pending &= ~(1 << frames[-1].hint_index)
+        finally:
+            while trail:
+                state.remove(trail.pop())
+
+def all_hints_pending(hints: List[Hint]) -> int:
+    return (1 << len(hints)) - 1
+
 def backtrack(hints: List[Hint], 
-              floor_assignments: List[FloorAssignment], 
-              empty_floors: List[Floor], 
-              animal_options: List[Animal],
-              color_options: List[Color]) -> int:
+              state: SearchState, 
+              pending: Optional[int] = None, 
+              cache: Optional[TranspositionCache] = None,
+              stats: Optional[SearchStats] = None,
+              ordering: HintOrdering = order_most_constrained,
+              limit: Optional[int] = None) -> int:
     """
-    Counts all possible floor assignments that satisfy the list of hints, available floors, available colors and available animals given.
+    Counts all possible assignments that extend the search state and satisfy the pending hints
+    (a bitmask over the hint list, all of them by default), up to the limit if given. See Backtracker.
     """
+    if pending is None:
+        pending = all_hints_pending(hints)
+    return Backtracker(hints, cache, stats, ordering).count(state, pending, limit)
+
+def count_by_propagation(hints: List[Hint], 
+                         domain_state: DomainState, 
+                         counted_families: Optional[Tuple[int, ...]] = None,
+                         stats: Optional[SearchStats] = None) -> int:
+    """
+    Counts the assignments that satisfy the hints, within the domains of the given state, by constraint propagation:
+    the domains are propagated (see DomainState.propagate) at every node, and the search branches on the floors of
+    the hinted attribute with the fewest floors left. Once all hinted attributes are on a single floor, the values
+    no hint refers to are spread freely over the floors left, of every counted family.
+    """
+    schema = domain_state.schema
+    if counted_families is None:
+        counted_families = tuple(range(len(schema.families)))
+    hinted_attributes = sorted({attribute for hint in hints for attribute in hint.attributes if not is_floor(attribute)},
+                               key=attribute_key)
+    free_values = [len(schema.families[family_index]) for family_index in counted_families]
+    for attribute in hinted_attributes:
+        family_index = schema.family_index[type(attribute)]
+        if family_index in counted_families:
+            free_values[counted_families.index(family_index)] -= 1
+    completions = math.prod(math.factorial(values) for values in free_values)
+    return _count_by_propagation(hints, domain_state, hinted_attributes, completions, stats, 0)
+
+def _count_by_propagation(hints: List[Hint], 
+                          domain_state: DomainState, 
+                          hinted_attributes: List[Union[Color, Animal]],
+                          completions: int,
+                          stats: Optional[SearchStats],
+                          depth: int) -> int:
+    if stats is not None:
+        stats.nodes += 1
+        stats.max_depth = max(stats.max_depth, depth)
+    if not domain_state.propagate(hints):
+        if stats is not None:
+            stats.dead_ends += 1
+            if stats.trace is not None:
+                stats.trace('dead_end', depth, None)
+        return 0
+
+    branch_attribute, branch_floors = None, 0
+    for attribute in hinted_attributes:
+        floors = domain_state.domain_of(attribute)
+        if floors & (floors - 1) and (branch_attribute is None or bin(floors).count('1') < bin(branch_floors).count('1')):
+            branch_attribute, branch_floors = attribute, floors
+    if branch_attribute is None:
+        return completions
 
-    if len(hints) == 0:
-        return math.factorial(len(animal_options))*math.factorial(len(color_options))
-    
     possible_options = 0
+    for floor in iter_bits(branch_floors):
+        child_state = domain_state.copy()
+        child_state.set_domain(branch_attribute, 1 << floor)
+        possible_options += _count_by_propagation(hints, child_state, hinted_attributes, completions, stats, depth + 1)
+    return possible_options
 
-    cur_hint = hints[0]
-    possible_floor_assignment = cur_hint.get_possible_floor_assignments(empty_floors, animal_options, color_options, floor_assignments)
+def check_hint(hint: Hint, schema: TowerSchema = DEFAULT_SCHEMA):
+    """ Raises ValueError if the hint refers to a floor or a family that isn't in the tower of the schema. """
+    for attribute in hint.attributes:
+        if is_floor(attribute) and not MIN_FLOOR <= int(attribute) <= schema.floor_count:
+            raise ValueError(f'Floor {int(attribute)} is not in a tower of {schema.floor_count} floors')
+        if not is_floor(attribute) and type(attribute) not in schema.family_index:
+            raise ValueError(f'{type(attribute).__name__} is not a family of the tower')
 
-    if len(possible_floor_assignment) == 0:
-        # Check if hint was already satisfied. If so, skip current hint.
-        if cur_hint.check_if_satisfied(floor_assignments):
-            return backtrack(hints=hints[1:], 
-                                      floor_assignments = list(floor_assignments),
-                                      empty_floors=list(empty_floors),
-                                      animal_options=list(animal_options),
-                                      color_options=list(color_options))
+def normalize_hints(hints: List[Hint], schema: TowerSchema = DEFAULT_SCHEMA) -> Optional[List[Hint]]:
+    """
+    Rewrites the hints in canonical form (see Hint.normalized) and drops duplicates and hints that always hold,
+    keeping the order of the rest.
+    Returns None if one of the hints can never hold, so there are no valid assignments at all.
+    Raises ValueError if a hint refers to a floor or a family that isn't in the tower of the schema (see check_hint).
+    """
+    normalized_hints = {}
+    for hint in hints:
+        check_hint(hint, schema)
+        canonical_hints = hint.normalized(schema)
+        if canonical_hints is None:
+            return None
+        for canonical_hint in canonical_hints:
+            normalized_hints.setdefault(canonical_hint)
+    return list(normalized_hints)
 
-    for floor_assigmment, additional_hints in possible_floor_assignment:
-        
-        if floor_assigmment is None:
-            # Hint attibute was already assigned in a previous floor, however additional hint was needed.
-            possible_options += backtrack(hints=hints[1:] + additional_hints, 
-                                      floor_assignments = list(floor_assignments),
-                                      empty_floors=list(empty_floors),
-                                      animal_options=list(animal_options),
-                                      color_options=list(color_options))
+def factorize_hints(hints: List[Hint], schema: TowerSchema = DEFAULT_SCHEMA) -> Optional[List[Tuple[Tuple[int, ...], List[Hint]]]]:
+    """
+    Splits the hints into groups that constrain disjoint sets of families, which can be counted independently:
+    the count of the hints is the product of the counts of the groups.
+    Two families are in the same group when a hint refers to both of them (floors don't couple families, as every
+    family is spread over all the floors). Families no hint refers to get groups of their own, without hints.
+    Hints that only refer to floors either always hold or never do; returns None if one of them doesn't.
+    Returns the (family indices, hints) of every group.
+    """
+    family_groups = list(range(len(schema.families)))
+
+    def find_group(family_index: int) -> int:
+        while family_groups[family_index] != family_index:
+            family_index = family_groups[family_index]
+        return family_index
+
+    hint_families = []
+    for hint in hints:
+        families = [schema.family_index[type(attribute)] for attribute in hint.attributes if not is_floor(attribute)]
+        if not families:
+            attr1, attr2 = hint.attributes
+            if not hint.floors_match(int(attr1), int(attr2)):
+                return None
+            continue
+        for family_index in families[1:]:
+            family_groups[find_group(family_index)] = find_group(families[0])
+        hint_families.append((hint, families[0]))
+
+    groups = {}
+    for family_index in range(len(schema.families)):
+        groups.setdefault(find_group(family_index), []).append(family_index)
+    group_hints = {group: [] for group in groups}
+    for hint, family_index in hint_families:
+        group_hints[find_group(family_index)].append(hint)
+    return [(tuple(groups[group]), group_hints[group]) for group in groups]
+
+def count_matchings(domains: List[int], floors_mask: int) -> int:
+    """
+    Returns the number of ways to put every value on a floor of its domain (a bitmask of floors), two values never on
+    the same floor, with all the values on floors of floors_mask: the permanent of the value x floor matrix of the
+    domains, computed by a DP over the subsets of the floors taken by the values so far.
+    """
+    ways = {0: 1}
+    for domain in sorted(domains, key=lambda domain: bin(domain).count('1')):
+        domain &= floors_mask
+        next_ways = {}
+        for taken_floors, count in ways.items():
+            for floor in iter_bits(domain & ~taken_floors):
+                next_taken_floors = taken_floors | (1 << floor)
+                next_ways[next_taken_floors] = next_ways.get(next_taken_floors, 0) + count
+        ways = next_ways
+    return sum(ways.values())
+
+def count_absolute_hints(hints: List[Hint], 
+                         counted_families: Optional[Tuple[int, ...]] = None,
+                         schema: TowerSchema = DEFAULT_SCHEMA) -> int:
+    """
+    Counts the assignments that satisfy the hints, which have to be normalized AbsoluteHints only, algebraically
+    instead of searching.
+    Hints between two values tie them to the same floor, so the values are grouped into blocks, each one on a single
+    floor that is in the domain of all its values (floor hints restrict the domains). Blocks of values of a single family
+    are a matching of the family's values to its floors, counted by count_matchings. The blocks of several families
+    couple these families: they are placed first, by a DP over the floors they take in every family, and every family's
+    matching is then counted on the floors left to it.
+    Only the counted families (all of them by default) are counted, so the hints should only refer to them.
+    """
+    if counted_families is None:
+        counted_families = tuple(range(len(schema.families)))
+    block_of = {}
+    domains = {}
+
+    def find_block(attribute):
+        while block_of.setdefault(attribute, attribute) != attribute:
+            attribute = block_of[attribute]
+        return attribute
+
+    for hint in hints:
+        attr1, attr2 = hint.attributes
+        if is_floor(attr1):
+            block = find_block(attr2)
+            domains[block] = domains.get(block, schema.all_floors_mask) & (1 << int(attr1))
+        else:
+            block1, block2 = find_block(attr1), find_block(attr2)
+            if block1 != block2:
+                block_of[block2] = block1
+                domains[block1] = domains.get(block1, schema.all_floors_mask) & domains.pop(block2, schema.all_floors_mask)
+
+    blocks = {}
+    for attribute in block_of:
+        blocks.setdefault(find_block(attribute), []).append(attribute)
+    family_domains = {family_index: [] for family_index in counted_families}
+    coupling_blocks = []
+    for block, attributes in blocks.items():
+        domain = domains.get(block, schema.all_floors_mask)
+        families = [schema.family_index[type(attribute)] for attribute in attributes]
+        if len(set(families)) < len(families):
+            return 0  # Two values of the same family on the same floor.
+        if len(families) == 1:
+            family_domains[families[0]].append(domain)
+        else:
+            coupling_blocks.append(([counted_families.index(family_index) for family_index in families], domain))
+
+    # The ways to place the coupling blocks, by the floors they take in every family.
+    placements = {(0,) * len(counted_families): 1}
+    for block_families, domain in coupling_blocks:
+        next_placements = {}
+        for taken_floors, count in placements.items():
+            free_floors = domain
+            for family_position in block_families:
+                free_floors &= ~taken_floors[family_position]
+            for floor in iter_bits(free_floors):
+                next_taken_floors = list(taken_floors)
+                for family_position in block_families:
+                    next_taken_floors[family_position] |= 1 << floor
+                next_taken_floors = tuple(next_taken_floors)
+                next_placements[next_taken_floors] = next_placements.get(next_taken_floors, 0) + count
+        placements = next_placements
+
+    count = 0
+    family_counts = {}
+    for taken_floors, placement_count in placements.items():
+        for family_position, family_index in enumerate(counted_families):
+            key = (family_position, taken_floors[family_position])
+            if key not in family_counts:
+                free_floors = schema.all_floors_mask & ~taken_floors[family_position]
+                free_values = bin(free_floors).count('1') - len(family_domains[family_index])
+                family_counts[key] = count_matchings(family_domains[family_index], free_floors) * math.factorial(free_values)
+            placement_count *= family_counts[key]
+        count += placement_count
+    return count
+
+def _attribute_floors(attribute: Union[Floor, Color, Animal], permutation_floors: 'np.ndarray'):
+    """
+    Returns the floor of the attribute in each of the given permutations of its family,
+    or the floor number itself for Floor attributes.
+    """
+    if is_floor(attribute):
+        return int(attribute)
+    return permutation_floors[:, VALUE_INDEX[attribute]]
+
+def _attribute_grid_floors(attribute: Union[Floor, Color, Animal], permutation_floors: List['np.ndarray']):
+    """
+    Like _attribute_floors, given the permutations of every family, shaped to broadcast along the attribute's family axis
+    (axis i for the i'th family in FAMILIES).
+    """
+    if is_floor(attribute):
+        return int(attribute)
+    family_index = FAMILY_INDEX[type(attribute)]
+    shape = [1] * len(FAMILIES)
+    shape[family_index] = -1
+    return _attribute_floors(attribute, permutation_floors[family_index]).reshape(shape)
+
+def count_assignments_vectorized(hints: List[Hint]) -> int:
+    """
+    Counts the valid assignments with numpy, over the permutations of every family.
+    Hints that refer to a single family are compiled to a boolean mask over the permutations of that family,
+    so as long as no hint couples families the count is the product of the masks' sizes.
+    Only the coupling hints are evaluated over the grid of the family permutations left.
+    """
+    if np is None:
+        raise ImportError('The vectorized engine requires numpy')
+
+    family_masks = [np.ones(len(PERMUTATION_FLOORS), dtype=bool) for _ in FAMILIES]
+    coupling_hints = []
+    for hint in hints:
+        attr1, attr2 = hint.attributes
+        families = {FAMILY_INDEX[type(attribute)] for attribute in hint.attributes if not is_floor(attribute)}
+        if not families:
+            if not hint.floors_match(attr1.value, attr2.value):
+                return 0
+        elif len(families) == 1:
+            family_index, = families
+            family_masks[family_index] &= hint.floors_match(_attribute_floors(attr1, PERMUTATION_FLOORS),
+                                                            _attribute_floors(attr2, PERMUTATION_FLOORS))
         else:
-            # With the new floor assignment, cur hint is satisfied. Remove used attributes from available options, and continue to next hint.
-            possible_options += backtrack(hints=additional_hints + hints[1:], 
-                                        floor_assignments = list(floor_assignments) + [floor_assigmment],
-                                        empty_floors=remove_value(empty_floors, floor_assigmment.floor),
-                                        animal_options=remove_value(animal_options, floor_assigmment.animal),
-                                        color_options=remove_value(color_options, floor_assigmment.color))
+            coupling_hints.append(hint)
+
+    if not coupling_hints:
+        return math.prod(int(mask.sum()) for mask in family_masks)
 
-    return possible_options 
+    permutation_floors = [PERMUTATION_FLOORS[mask] for mask in family_masks]
+    grid = np.ones([len(floors) for floors in permutation_floors], dtype=bool)
+    for hint in coupling_hints:
+        attr1, attr2 = hint.attributes
+        grid &= hint.floors_match(_attribute_grid_floors(attr1, permutation_floors), 
+                                  _attribute_grid_floors(attr2, permutation_floors))
+    return int(grid.sum())
 
-def count_assignments(hints: List[Hint]): # Reminder: Don't change the function signature
+def count_assignments(hints: List[Hint], # Reminder: Don't change the function signature
+                      cache: Optional[TranspositionCache] = None,
+                      engine: str = 'backtrack',
+                      stats: Optional[SearchStats] = None,
+                      ordering: HintOrdering = order_most_constrained,
+                      limit: Optional[int] = None,
+                      schema: TowerSchema = DEFAULT_SCHEMA):
     """
     Given a list of Hint objects, return the number of
     valid assignments that satisfy these hints.
+    The engine is either 'backtrack' (see backtrack), 'propagation' (see count_by_propagation) or 'numpy'
+    (see count_assignments_vectorized).
+    Counts of sub-searches of the backtracking engine are memoized in the given cache, or in a new one for this call.
+    The search engines fill in the given stats, and the backtracking engine expands the hints in the given ordering
+    (see HINT_ORDERINGS).
+    Groups of hints that are all AbsoluteHints are counted without a search by the backtracking engine
+    (see count_absolute_hints).
+    If a limit is given, the count is at most `limit`: the backtracking engine stops as soon as it found
+    `limit` assignments, so checking if a puzzle has a single solution only takes limit=2.
+    The tower has the floors and families of the given schema (see TowerSchema); the numpy engine only counts
+    the default one, of five floors with a color and an animal each.
+    """
+    return _run_steps(_count_assignments_in_steps(hints, cache, engine, stats, ordering, limit, schema))
+
+def _run_steps(steps: Generator[int, None, int]) -> int:
+    """ Runs a stepped count (see Backtracker.count_in_steps) to its end, and returns the count. """
+    while True:
+        try:
+            next(steps)
+        except StopIteration as stop:
+            return stop.value
+
+def _count_assignments_in_steps(hints: List[Hint], 
+                                cache: Optional[TranspositionCache] = None,
+                                engine: str = 'backtrack',
+                                stats: Optional[SearchStats] = None,
+                                ordering: HintOrdering = order_most_constrained,
+                                limit: Optional[int] = None,
+                                schema: TowerSchema = DEFAULT_SCHEMA,
+                                step_nodes: Optional[int] = None) -> Generator[int, None, int]:
+    """
+    Counts like count_assignments, as a generator that returns the count when it finishes. Every `step_nodes` search
+    nodes of the backtracking searches (if given), it yields the number of nodes the current search entered so far
+    (see Backtracker.count_in_steps), so the count can be interleaved with other work, or abandoned by closing it.
+    The other engines and the counts without a search run in a single step.
+    """
+    if stats is not None:
+        start_time = time.perf_counter()
+    hints = normalize_hints(hints, schema)
+    if stats is not None:
+        stats.add_phase_time('normalize', start_time)
+    if hints is None:
+        return 0
+    if engine == 'numpy':
+        if schema is not DEFAULT_SCHEMA:
+            raise ValueError('The numpy engine only counts towers of the default schema')
+        if stats is not None:
+            start_time = time.perf_counter()
+        count = count_assignments_vectorized(hints)
+        if stats is not None:
+            stats.add_phase_time('search', start_time)
+        return count if limit is None else min(count, limit)
+    if engine not in ('backtrack', 'propagation'):
+        raise ValueError(f'Unknown engine: {engine}')
+    if cache is None:
+        cache = TranspositionCache()
+    if stats is not None:
+        start_time = time.perf_counter()
+    components = factorize_hints(hints, schema)
+    if stats is not None:
+        stats.add_phase_time('factorize', start_time)
+    if components is None:
+        return 0
+
+    if stats is not None:
+        start_time = time.perf_counter()
+    count = 1
+    for counted_families, component_hints in components:
+        if engine == 'backtrack' and all(isinstance(hint, AbsoluteHint) for hint in component_hints):
+            component_count = count_absolute_hints(component_hints, counted_families, schema)
+        elif engine == 'propagation':
+            component_count = count_by_propagation(component_hints, DomainState(schema=schema), counted_families, stats)
+        else:
+            backtracker = Backtracker(component_hints, cache, stats, ordering)
+            component_count = yield from backtracker.count_in_steps(SearchState(counted_families, schema), 
+                                                                    all_hints_pending(component_hints), limit, step_nodes)
+        count *= component_count
+        if count == 0:
+            break
+    if stats is not None:
+        stats.add_phase_time('search', start_time)
+    # Every component count is exact, or at least the limit, so their product is too.
+    return count if limit is None else min(count, limit)
+
+def iter_assignments(hints: List[Hint], 
+                     ordering: HintOrdering = order_most_constrained,
+                     schema: TowerSchema = DEFAULT_SCHEMA) -> Iterator[List[FloorAssignment]]:
+    """
+    Lazily yields every valid assignment that satisfies the hints, as a list of the floor assignments of all floors,
+    sorted by floor. The assignments are found by the backtracking search (see Backtracker).
+    In a tower of a custom schema, the floor assignments are those of TowerSchema.floor_assignment.
+    """
+    hints = normalize_hints(hints, schema)
+    if hints is None:
+        return
+    yield from Backtracker(hints, ordering=ordering).iter_assignments(SearchState(schema=schema), all_hints_pending(hints))
+
+# Every complete assignment has an index: the digits of the index in base len(PERMUTATIONS) are the indices of the
+# permutations of the families, the first family's being the most significant digit.
+ASSIGNMENT_COUNT = len(PERMUTATIONS) ** len(FAMILIES)
+ALL_ASSIGNMENTS_MASK = (1 << ASSIGNMENT_COUNT) - 1
+
+def assignment_from_index(index: int) -> List[FloorAssignment]:
+    """ Returns the assignment with the given index, as the floor assignments of all floors sorted by floor. """
+    floor_values = []
+    for family_index in reversed(range(len(FAMILIES))):
+        index, permutation_index = divmod(index, len(PERMUTATIONS))
+        values = [None] * (MAX_FLOOR + 1)
+        for value, floor in zip(FAMILY_MEMBERS[family_index], PERMUTATIONS[permutation_index]):
+            values[floor] = value
+        floor_values.insert(0, values)
+    return [make_floor_assignment(floor, *(values[floor] for values in floor_values)) for floor in Floor]
+
+AssignmentPredicate = Callable[[Sequence[Sequence[int]]], bool]
+
+def compile_hints(hints: List[Hint], schema: TowerSchema = DEFAULT_SCHEMA) -> AssignmentPredicate:
+    """
+    Compiles the hints into a single predicate over packed complete assignments, that checks if all of them hold.
+    A packed assignment holds the floor of every value of every family: positions[family index][value index], like
+    SearchState.positions or a permutation of PERMUTATIONS per family (see pack_assignment).
+    Every hint becomes a comparison of two indexed floors (or constant floors), so verifying an assignment doesn't
+    search the floors for the hinted attributes, and the predicate can be reused for any number of assignments.
+    """
+    # Only ints are pasted into the source, so a hint can't run code of its own in the predicate.
+    for hint in hints:
+        if isinstance(hint, RelativeHint) and type(hint.signature[-1]) is not int:
+            raise ValueError(f'Invalid difference: {hint.signature[-1]!r}')
+
+    def floor_source(attribute) -> str:
+        if is_floor(attribute):
+            return str(int(attribute))
+        family_index, value_index = schema.value_slots[attribute]
+        return f'positions{family_index}[{value_index}]'
+
+    conditions = [f'({hint.floors_match_source(*(floor_source(attribute) for attribute in hint.attributes))})' for hint in hints]
+    family_positions = ''.join(f'positions{family_index}, ' for family_index in range(len(schema.families)))
+    source = (f'def predicate(positions):\n'
+              f'    {family_positions} = positions\n'
+              f'    return {" and ".join(conditions) or "True"}\n')
+    namespace = {}
+    exec(compile(source, '<compiled hints>', 'exec'), namespace)
+    return namespace['predicate']
+
+def pack_assignment(floor_assignments: List[FloorAssignment], schema: TowerSchema = DEFAULT_SCHEMA) -> List[List[int]]:
+    """ Packs an assignment, given as the floor assignments of all floors, into the positions compile_hints checks. """
+    positions = [[0] * len(family) for family in schema.families]
+    for floor_assignment in floor_assignments:
+        floor, *values = (floor_assignment.floor, floor_assignment.color, floor_assignment.animal) \
+            if isinstance(floor_assignment, FloorAssignment) else floor_assignment
+        for value in values:
+            family_index, value_index = schema.value_slots[value]
+            positions[family_index][value_index] = int(floor)
+    return positions
+
+@functools.lru_cache(maxsize=None)
+def attribute_floor_mask(attribute: Union[Floor, Color, Animal], floor: int) -> int:
+    """ Returns the bitmap of the indices of all the assignments in which the attribute is on the given floor. """
+    if is_floor(attribute):
+        return ALL_ASSIGNMENTS_MASK if int(attribute) == floor else 0
+    family_index = FAMILY_INDEX[type(attribute)]
+    value_index = VALUE_INDEX[attribute]
+    # The family's permutation index is a digit that repeats `stride` times in a row, in periods of all its values.
+    stride = len(PERMUTATIONS) ** (len(FAMILIES) - 1 - family_index)
+    period = stride * len(PERMUTATIONS)
+    period_mask = 0
+    for permutation_index, permutation in enumerate(PERMUTATIONS):
+        if permutation[value_index] == floor:
+            period_mask |= ((1 << stride) - 1) << (permutation_index * stride)
+    return period_mask * sum(1 << (period * repeat) for repeat in range(ASSIGNMENT_COUNT // period))
+
+@functools.lru_cache(maxsize=4096)
+def assignment_mask(hint: Hint) -> int:
+    """ Returns the bitmap of the indices of all the assignments that satisfy the hint. """
+    attr1, attr2 = hint.attributes
+    mask = 0
+    for floor1 in Floor:
+        for floor2 in Floor:
+            if hint.floors_match(floor1.value, floor2.value):
+                mask |= attribute_floor_mask(attr1, floor1.value) & attribute_floor_mask(attr2, floor2.value)
+    return mask
+
+class TowerSession(object):
+    """
+    A set of hints that is edited one hint at a time, with the assignments that satisfy it cached as a bitmap over the
+    assignment indices (see assignment_mask).
+    A checkpoint of the surviving assignments is kept after every hint, so adding a hint only filters the last
+    survivors, and removing a hint only recomputes the checkpoints of the hints that were added after it.
+    """
+    def __init__(self, hints: Iterable[Hint] = ()):
+        self._hints = []
+        self._checkpoints = [ALL_ASSIGNMENTS_MASK]
+        for hint in hints:
+            self.add_hint(hint)
+
+    @property
+    def hints(self) -> List[Hint]:
+        return list(self._hints)
+
+    @property
+    def survivors(self) -> int:
+        """ The bitmap of the assignments that satisfy all the hints. """
+        return self._checkpoints[-1]
+
+    def add_hint(self, hint: Hint):
+        """ Adds a hint. Raises ValueError if it refers to a floor or a family that isn't in the tower (see check_hint). """
+        check_hint(hint)
+        self._hints.append(hint)
+        self._checkpoints.append(self._checkpoints[-1] & assignment_mask(hint))
+
+    def remove_hint(self, hint: Hint):
+        """ Removes the last hint that is equal to the given one. Raises ValueError if there is none. """
+        for hint_index in reversed(range(len(self._hints))):
+            if self._hints[hint_index] == hint:
+                break
+        else:
+            raise ValueError(f'{hint.signature} is not in the session')
+        del self._hints[hint_index]
+        del self._checkpoints[hint_index + 1:]
+        for later_hint in self._hints[hint_index:]:
+            self._checkpoints.append(self._checkpoints[-1] & assignment_mask(later_hint))
+
+    def count(self) -> int:
+        """ Returns the number of assignments that satisfy all the hints. """
+        return bin(self.survivors).count('1')
+
+    def has_single_assignment(self) -> bool:
+        """ Checks if exactly one assignment satisfies all the hints, without counting them all. """
+        survivors = self.survivors
+        return survivors != 0 and survivors & (survivors - 1) == 0
+
+    def iter_assignments(self) -> Iterator[List[FloorAssignment]]:
+        """ Yields the assignments that satisfy all the hints, in the order of their indices. """
+        for index in iter_bits(self.survivors):
+            yield assignment_from_index(index)
+
+def hints_satisfied_by(index: int) -> List[Hint]:
+    """
+    Returns every hint between two attributes (not both floors) that holds in the assignment with the given index:
+    an AbsoluteHint for attributes on the same floor, a RelativeHint for attributes on different floors,
+    and a NeighborHint too for attributes on adjacent floors.
+    """
+    floors = {attribute: floor_assignment.floor for floor_assignment in assignment_from_index(index)
+              for attribute in (floor_assignment.floor, floor_assignment.color, floor_assignment.animal)}
+    hints = []
+    for attr1, attr2 in itertools.combinations(sorted(floors, key=attribute_key), 2):
+        if is_floor(attr1) and is_floor(attr2):
+            continue
+        difference = floors[attr1] - floors[attr2]
+        if difference == 0:
+            hints.append(AbsoluteHint(attr1, attr2))
+        else:
+            hints.append(RelativeHint(attr1, attr2, difference))
+            if abs(difference) == 1:
+                hints.append(NeighborHint(attr1, attr2))
+    return hints
+
+# The relative weights of the hint types generate_unique_puzzle picks from.
+PUZZLE_HINT_WEIGHTS = {AbsoluteHint: 1.0, RelativeHint: 1.0, NeighborHint: 1.0}
+
+def generate_unique_puzzle(rng: random.Random, 
+                           hint_weights: Dict[type, float] = PUZZLE_HINT_WEIGHTS,
+                           minimize: bool = True) -> Tuple[List[Hint], List[FloorAssignment]]:
+    """
+    Generates a puzzle with a single solution: picks a random assignment, and adds random hints that hold in it
+    (see hints_satisfied_by), of types drawn with the given weights, until it's the only assignment left.
+    Hints that don't rule out any assignment are skipped. If minimize is set, hints that aren't needed for the
+    solution to be unique are then removed, in random order.
+    The hints are edited in a TowerSession, so every step only filters the surviving assignments of the previous one
+    instead of counting from scratch, and uniqueness is checked without counting (see has_single_assignment).
+    Returns the hints and the solution.
+    """
+    index = rng.randrange(ASSIGNMENT_COUNT)
+    candidates = {hint_type: [] for hint_type in hint_weights}
+    for hint in hints_satisfied_by(index):
+        if type(hint) in candidates:
+            candidates[type(hint)].append(hint)
+
+    session = TowerSession()
+    while not session.has_single_assignment():
+        hint_types = [hint_type for hint_type, hints in candidates.items() if hints]
+        if not hint_types:
+            raise ValueError('The hint types of the weights can\'t single out an assignment')
+        hints = candidates[rng.choices(hint_types, [hint_weights[hint_type] for hint_type in hint_types])[0]]
+        hint = hints.pop(rng.randrange(len(hints)))
+        if session.survivors & assignment_mask(hint) != session.survivors:
+            session.add_hint(hint)
+
+    if minimize:
+        for hint in rng.sample(session.hints, len(session.hints)):
+            session.remove_hint(hint)
+            if not session.has_single_assignment():
+                session.add_hint(hint)
+    return session.hints, assignment_from_index(index)
+
+def iter_unique_puzzles(seed: Optional[int] = None, 
+                        hint_weights: Dict[type, float] = PUZZLE_HINT_WEIGHTS,
+                        minimize: bool = True) -> Iterator[Tuple[List[Hint], List[FloorAssignment]]]:
+    """ Endlessly yields the (hints, solution) of new puzzles with a single solution (see generate_unique_puzzle). """
+    rng = random.Random(seed)
+    while True:
+        yield generate_unique_puzzle(rng, hint_weights, minimize)
+
+def canonical_hints_key(hints: List[Hint], schema: TowerSchema = DEFAULT_SCHEMA) -> Optional[str]:
+    """
+    Returns a key of the hint list that doesn't depend on the order of the hints or on equivalent rewrites of them
+    (see normalize_hints): the SHA-256 of the sorted canonical hints, and of the schema's floors and families.
+    Attributes are encoded by name, so the key is the same in every process. Returns None if the hints never hold.
+    """
+    hints = normalize_hints(hints, schema)
+    if hints is None:
+        return None
+
+    def encode_attribute(attribute):
+        return int(attribute) if is_floor(attribute) else (type(attribute).__name__, attribute.name)
+
+    encoded_hints = sorted(repr((type(hint).__name__, *map(encode_attribute, hint.attributes), *hint.signature[3:])) 
+                           for hint in hints)
+    encoded_schema = (schema.floor_count, [(family.__name__, [value.name for value in family]) for family in schema.families])
+    return hashlib.sha256(repr((encoded_schema, encoded_hints)).encode()).hexdigest()
+
+class ResultCache(object):
+    """
+    A persistent cache of the counts of hint lists, in an sqlite database file, keyed by canonical_hints_key so
+    reordered or rewritten hint lists share a count.
+    The cache may be shared by concurrent processes: the database is in WAL mode, and writers wait up to `timeout`
+    seconds for each other. Once it holds more than max_entries counts (checked every max_entries // 100 writes),
+    the least recently used ones are evicted.
+    hits and misses count the lookups of this instance.
+    """
+    _NEXT_USE = 'SELECT COALESCE(MAX(last_used), 0) + 1 FROM counts'
+
+    def __init__(self, path: str, max_entries: int = 100000, timeout: float = 30.0):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._writes_since_eviction = 0
+        self._connection = sqlite3.connect(path, timeout=timeout, isolation_level=None)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        # last_used is a sequence number of the uses of the counts, shared by all the processes using the file.
+        self._connection.execute('CREATE TABLE IF NOT EXISTS counts (key TEXT PRIMARY KEY, count TEXT NOT NULL, last_used INTEGER NOT NULL)')
+        self._connection.execute('CREATE INDEX IF NOT EXISTS counts_last_used ON counts (last_used)')
+
+    def __len__(self) -> int:
+        return self._connection.execute('SELECT COUNT(*) FROM counts').fetchone()[0]
+
+    def __enter__(self) -> 'ResultCache':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self._connection.close()
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def get(self, key: str) -> Optional[int]:
+        row = self._connection.execute('SELECT count FROM counts WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._connection.execute(f'UPDATE counts SET last_used = ({self._NEXT_USE}) WHERE key = ?', (key,))
+        return int(row[0])
+
+    def put(self, key: str, count: int):
+        # Counts are stored as text, as those of large towers don't fit in sqlite's 64 bit integers.
+        self._connection.execute(f'INSERT OR REPLACE INTO counts VALUES (?, ?, ({self._NEXT_USE}))', (key, str(count)))
+        self._writes_since_eviction += 1
+        if self._writes_since_eviction >= max(1, self.max_entries // 100):
+            self.evict()
+
+    def evict(self):
+        """ Evicts the least recently used counts, until at most max_entries are left. """
+        self._writes_since_eviction = 0
+        excess = len(self) - self.max_entries
+        if excess > 0:
+            self._connection.execute('DELETE FROM counts WHERE key IN (SELECT key FROM counts ORDER BY last_used LIMIT ?)', (excess,))
+
+def count_assignments_cached(hints: List[Hint], result_cache: ResultCache, schema: TowerSchema = DEFAULT_SCHEMA) -> int:
+    """ Like count_assignments, but looks the count up in the result cache first, and stores it there if it's missing. """
+    key = canonical_hints_key(hints, schema)
+    if key is None:
+        return 0
+    count = result_cache.get(key)
+    if count is None:
+        count = count_assignments(hints, schema=schema)
+        result_cache.put(key, count)
+    return count
+
+# The process pools shared by all the parallel APIs, by number of workers.
+_process_pools: Dict[int, ProcessPoolExecutor] = {}
+
+def get_process_pool(workers: int) -> ProcessPoolExecutor:
+    """
+    Returns the process pool with the given number of workers that's shared by all the parallel APIs, creating it
+    on first use. Pools are kept until exit, so streams counting over a pool aren't cut short by calls with
+    a different number of workers.
+    """
+    pool = _process_pools.get(workers)
+    if pool is None:
+        pool = _process_pools[workers] = ProcessPoolExecutor(max_workers=workers)
+    return pool
+
+@atexit.register
+def _shutdown_process_pools():
+    for pool in _process_pools.values():
+        pool.shutdown()
+
+def _count_assignments_chunk(hint_lists: List[List[Hint]]) -> List[int]:
+    return [count_assignments(hints) for hints in hint_lists]
+
+def count_assignments_many(hint_lists: Iterable[List[Hint]], 
+                           workers: Optional[int] = None, 
+                           chunksize: int = 64,
+                           result_cache: Optional[ResultCache] = None) -> Iterator[int]:
+    """
+    Counts the valid assignments of every hint list, over the shared process pool.
+    The hint lists are sent to the workers in chunks of `chunksize` lists, and the counts are yielded in input order
+    as soon as they are ready. Only a couple of chunks per worker are in flight at any time, so the input may be
+    a lazy (or endless) iterable.
+    With a single worker the lists are counted in this process.
+    If a result cache is given, the counts are looked up in it (in this process) and only the missing ones are counted,
+    a window of a couple of chunks per worker at a time.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    hint_lists = iter(hint_lists)
+    if result_cache is not None:
+        while True:
+            window = list(itertools.islice(hint_lists, 2 * workers * chunksize))
+            if not window:
+                return
+            keys = [canonical_hints_key(hints) for hints in window]
+            counts = [0 if key is None else result_cache.get(key) for key in keys]
+            missing = [index for index, count in enumerate(counts) if count is None]
+            missing_counts = count_assignments_many((window[index] for index in missing), workers, chunksize)
+            for index, count in zip(missing, missing_counts):
+                counts[index] = count
+                result_cache.put(keys[index], count)
+            yield from counts
+
+    if workers == 1:
+        for hints in hint_lists:
+            yield count_assignments(hints)
+        return
+
+    pool = get_process_pool(workers)
+    pending_chunks = deque()
+    while True:
+        while len(pending_chunks) < 2 * workers:
+            chunk = list(itertools.islice(hint_lists, chunksize))
+            if not chunk:
+                break
+            pending_chunks.append(pool.submit(_count_assignments_chunk, chunk))
+        if not pending_chunks:
+            return
+        yield from pending_chunks.popleft().result()
+
+def split_search(hints: List[Hint], min_subproblems: int) -> List[Tuple[List[Tuple[Union[Color, Animal], int]], int]]:
+    """
+    Expands the top levels of the search tree, level by level, until there are at least `min_subproblems` nodes
+    (or the tree is fully expanded).
+    The hints are expanded in the order of the hint list.
+    Returns the nodes as independent subproblems: the placements made so far and the bitmask of the pending hints,
+    and the counts of all subproblems sum up to the count of the hints.
+    """
+    subproblems = [([], all_hints_pending(hints))]
+    for hint_index, hint in enumerate(hints):
+        if len(subproblems) >= min_subproblems:
+            break
+        next_subproblems = []
+        for placements, pending in subproblems:
+            state = SearchState()
+            for attribute, floor in placements:
+                state.place(attribute, floor)
+            for _ in apply_possible_placements(hint, state):
+                next_subproblems.append((state.placements(), pending & ~(1 << hint_index)))
+        subproblems = next_subproblems
+    return subproblems
+
+# The cache of the subproblems a worker process counts, by the id of the search they were split from (see
+# count_assignments_parallel): the subproblems of a search share many of their nodes. Only the last search's is kept.
+_subproblem_caches: Dict[int, TranspositionCache] = {}
+_search_ids = itertools.count()
+
+def _count_subproblem(search_id: int, hints: List[Hint], counted_families: Tuple[int, ...], 
+                      placements: List[Tuple[Union[Color, Animal], int]], pending: int) -> int:
+    cache = _subproblem_caches.get(search_id)
+    if cache is None:
+        _subproblem_caches.clear()
+        cache = _subproblem_caches[search_id] = TranspositionCache()
+    state = SearchState(counted_families)
+    for attribute, floor in placements:
+        state.place(attribute, floor)
+    return backtrack(hints, state, pending, cache=cache)
+
+def count_assignments_parallel(hints: List[Hint], 
+                               workers: Optional[int] = None, 
+                               subproblems_per_worker: int = 8) -> int:
+    """
+    Counts the valid assignments of a single hint list over the shared process pool.
+    The hints are factorized first (see factorize_hints), and only the groups that need a search are split.
+    The search tree of each is split into many more subproblems than workers (see split_search), and the workers pick
+    the subproblems up from the pool's shared queue as they become idle, so a worker that got cheap subproblems
+    takes over the rest of the work from the busy ones. The partial counts are summed.
+    With a single worker, the groups are searched in this process without splitting, like count_assignments.
     """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    hints = normalize_hints(hints)
+    if hints is None:
+        return 0
+    components = factorize_hints(hints)
+    if components is None:
+        return 0
 
-    empty_floors = [Floor.First, Floor.Second, Floor.Third, Floor.Fourth, Floor.Fifth]
-    animal_options = [Animal.Bird, Animal.Chicken, Animal.Frog, Animal.Grasshopper, Animal.Rabbit]
-    color_options = [Color.Blue, Color.Green, Color.Orange, Color.Red, Color.Yellow]
-    floor_assignments = []
+    cache = TranspositionCache()
+    count = 1
+    for counted_families, component_hints in components:
+        if all(isinstance(hint, AbsoluteHint) for hint in component_hints):
+            component_count = count_absolute_hints(component_hints, counted_families)
+        elif workers == 1:
+            component_count = backtrack(component_hints, SearchState(counted_families), cache=cache)
+        else:
+            pool = get_process_pool(workers)
+            search_id = next(_search_ids)
+            futures = [pool.submit(_count_subproblem, search_id, component_hints, counted_families, placements, pending) 
+                       for placements, pending in split_search(component_hints, workers * subproblems_per_worker)]
+            component_count = sum(future.result() for future in futures)
+        count *= component_count
+        if count == 0:
+            break
+    return count
+
+@dataclass
+class CountResult:
+    """
+    The result of count_assignments_async:
+    count - the number of valid assignments (at most the limit, if given), or None if the search was cut short.
+    complete - whether the search finished within its time budget.
+    nodes - the search nodes entered by the backtracking search, until it finished or was cut short.
+    """
+    count: Optional[int]
+    complete: bool
+    nodes: int
+
+async def count_assignments_async(hints: List[Hint], 
+                                  timeout: Optional[float] = None,
+                                  step_nodes: int = 1000,
+                                  limit: Optional[int] = None,
+                                  ordering: HintOrdering = order_most_constrained,
+                                  stats: Optional[SearchStats] = None,
+                                  schema: TowerSchema = DEFAULT_SCHEMA) -> CountResult:
+    """
+    Counts the valid assignments like count_assignments with the backtracking engine, but runs the search cooperatively
+    on the event loop: every `step_nodes` search nodes (see Backtracker.count_in_steps), it checks the deadline and
+    yields to the other tasks. So a hard hint list doesn't stall the loop, and cancelling the task stops the search.
+    If the search is still running `timeout` seconds after the call, it's abandoned, and the result is partial:
+    its count is None, and it tells how many nodes were explored.
+    The search fills in the given stats, or stats of its own, which count the nodes.
+    """
+    if stats is None:
+        stats = SearchStats()
+    start_nodes = stats.nodes
+    deadline = None if timeout is None else time.monotonic() + timeout
+    steps = _count_assignments_in_steps(hints, stats=stats, ordering=ordering, limit=limit, schema=schema, 
+                                        step_nodes=step_nodes)
+    try:
+        while True:
+            next(steps)
+            if deadline is not None and time.monotonic() >= deadline:
+                return CountResult(None, False, stats.nodes - start_nodes)
+            await asyncio.sleep(0)
+    except StopIteration as stop:
+        return CountResult(stop.value, True, stats.nodes - start_nodes)
+    finally:
+        steps.close()
 
+# Hint lists are serialized one per line, as a JSON array of hints: ["A", attr1, attr2] for an AbsoluteHint,
+# ["N", attr1, attr2] for a NeighborHint and ["R", attr1, attr2, difference] for a RelativeHint, where floors are their
+# numbers (in the default tower) and colors and animals their names. For example: [["A","Rabbit",1],["N","Red","Green"],["R","Chicken","Blue",-4]]
+HINT_CODES = {'A': AbsoluteHint, 'N': NeighborHint, 'R': RelativeHint}
+HINT_TYPE_CODES = {hint_type: code for code, hint_type in HINT_CODES.items()}
+ATTRIBUTES_BY_NAME = {attribute.name: attribute for family in FAMILIES for attribute in family}
+
+def hint_to_json(hint: Hint) -> list:
+    """ Returns the JSON encoding of the hint (see HINT_CODES). """
+    encoded_hint = [HINT_TYPE_CODES[type(hint)]]
+    encoded_hint.extend(int(attribute) if is_floor(attribute) else attribute.name for attribute in hint.attributes)
+    if isinstance(hint, RelativeHint):
+        encoded_hint.append(hint.signature[-1])
+    return encoded_hint
+
+def _attribute_from_json(name: Union[str, int]) -> Union[Floor, Color, Animal]:
+    # JSON booleans are ints to Python, but they aren't floor numbers.
+    if type(name) is int:
+        if not MIN_FLOOR <= name <= MAX_FLOOR:
+            raise ValueError(f'Invalid floor: {name}')
+        return Floor(name)
+    if isinstance(name, str):
+        return ATTRIBUTES_BY_NAME[name]
+    raise ValueError(f'Invalid attribute: {name!r}')
+
+# typed, so a JSON true isn't taken for the cached hint of a 1.
+@functools.lru_cache(maxsize=4096, typed=True)
+def _hint_from_fields(code: str, name1: Union[str, int], name2: Union[str, int], *arguments) -> Hint:
+    # Puzzle files repeat the same hints over and over, so every distinct one is only parsed once.
+    hint_type = HINT_CODES[code]
+    if hint_type is RelativeHint:
+        if len(arguments) != 1 or type(arguments[0]) is not int:
+            raise ValueError(f'Invalid difference: {arguments!r}')
+    elif arguments:
+        raise ValueError(f'Unexpected fields: {arguments!r}')
+    return hint_type(_attribute_from_json(name1), _attribute_from_json(name2), *arguments)
+
+def hint_from_json(encoded_hint: list) -> Hint:
+    """ Returns the hint of the given JSON encoding (see HINT_CODES). Raises ValueError if it isn't a valid hint. """
+    try:
+        return _hint_from_fields(*encoded_hint)
+    except (KeyError, TypeError, ValueError) as error:
+        raise ValueError(f'Invalid hint: {json.dumps(encoded_hint)}') from error
+
+def dumps_hints(hints: List[Hint]) -> str:
+    """ Returns the line that encodes the hint list, without the line break. """
+    return json.dumps([hint_to_json(hint) for hint in hints], separators=(',', ':'))
+
+def loads_hints(line: str) -> List[Hint]:
+    """ Returns the hint list the line encodes. Raises ValueError if it doesn't encode a hint list. """
+    encoded_hints = json.loads(line)
+    if not isinstance(encoded_hints, list):
+        raise ValueError(f'Invalid hint list: {line.strip()}')
+    return [hint_from_json(encoded_hint) for encoded_hint in encoded_hints]
+
+def read_hint_lists(lines: Iterable[str]) -> Iterator[List[Hint]]:
+    """ Lazily parses the hint lists of the lines of a puzzle file, skipping blank lines. """
+    for line_number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            yield loads_hints(line)
+        except ValueError as error:
+            raise ValueError(f'Line {line_number}: {error}') from None
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    The command line interface: counts the assignments of every hint list of a puzzle file (see HINT_CODES),
+    and writes the counts one per line, in the order of the input. The puzzles are streamed, so the memory used
+    doesn't grow with the size of the file.
+    """
+    parser = argparse.ArgumentParser(prog='python -m count_assignments', description=main.__doc__.strip().split('\n')[0])
+    parser.add_argument('input', nargs='?', default='-', help='the puzzle file, one JSON hint list per line (default: stdin)')
+    parser.add_argument('-o', '--output', default='-', help='the file to write the counts to (default: stdout)')
+    parser.add_argument('-w', '--workers', type=int, default=1, help='the number of worker processes (default: 1)')
+    parser.add_argument('--chunksize', type=int, default=64, help='the number of puzzles sent to a worker at once')
+    parser.add_argument('--cache', help='an sqlite file to keep the counts in across runs (see ResultCache)')
+    args = parser.parse_args(argv)
 
+    result_cache = None
+    try:
+        with contextlib.ExitStack() as open_files:
+            input_file = sys.stdin if args.input == '-' else open_files.enter_context(open(args.input))
+            output_file = sys.stdout if args.output == '-' else open_files.enter_context(open(args.output, 'w'))
+            if args.cache:
+                result_cache = open_files.enter_context(ResultCache(args.cache))
+            for count in count_assignments_many(read_hint_lists(input_file), workers=args.workers, 
+                                                chunksize=args.chunksize, result_cache=result_cache):
+                output_file.write(f'{count}\n')
+    except (OSError, sqlite3.Error, ValueError) as error:
+        print(f'{parser.prog}: {error}', file=sys.stderr)
+        return 1
+    finally:
+        if result_cache is not None:
+            print(f'{parser.prog}: cache {result_cache.hits} hits, {result_cache.misses} misses '
+                  f'({result_cache.hit_rate:.0%} hit rate)', file=sys.stderr)
+    return 0
 
-    # Call the backtrack function to find all valid assignments
-    return backtrack(hints=hints,
-                     floor_assignments=floor_assignments, 
-                     empty_floors=empty_floors, 
-                     animal_options=animal_options, 
-                     color_options=color_options)
\ No newline at end of file
+if __name__ == '__main__':
+    # Run the main of the imported module rather than of __main__, so the hints sent to the worker processes are
+    # pickled as instances of count_assignments' classes.
+    from count_assignments import main as module_main
+    sys.exit(module_main())
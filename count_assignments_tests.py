@@ -1,6 +1,24 @@
 
-from count_assignments import AbsoluteHint, Animal, Color, Floor, FloorAssignment, NeighborHint, RelativeHint, count_assignments
+from count_assignments import FAMILY_KEYS, AbsoluteHint, Animal, Color, Floor, FloorAssignment, NeighborHint, RelativeHint, ResultCache, SearchState, TowerSchema, TowerSession, SearchStats, TranspositionCache, backtrack, canonical_hints_key, compile_hints, count_absolute_hints, count_assignments, count_assignments_async, count_assignments_cached, count_assignments_many, count_assignments_parallel, dumps_hints, factorize_hints, generate_unique_puzzle, iter_assignments, iter_unique_puzzles, loads_hints, main, normalize_hints, order_in_sequence, order_most_constrained, pack_assignment, propagate_all_different, split_search
+import asyncio
+from enum import IntEnum
+import itertools
 import math
+import pickle
+import random
+import pytest
+import sys
+import tracemalloc
+
+# The second example of the README, with four assignments, which most tests count.
+README_EXAMPLE_2 = [
+    AbsoluteHint(Animal.Bird, Floor.Fifth),
+    AbsoluteHint(Floor.First, Color.Green),
+    AbsoluteHint(Animal.Frog, Color.Yellow),
+    NeighborHint(Animal.Frog, Animal.Grasshopper),
+    NeighborHint(Color.Red, Color.Orange),
+    RelativeHint(Animal.Chicken, Color.Blue, -4)
+]
 
 def test_check_is_satisfied_absolute_hint():
     assert AbsoluteHint(Animal.Bird, Floor(1)).check_if_satisfied([FloorAssignment(floor=Floor(1), animal=Animal.Bird, color=Color.Blue)])
@@ -26,6 +44,39 @@ def test_get_possible_floor_assignments_absolute_hint_possible_hint():
     possible_floor_assignments = hint.get_possible_floor_assignments(empty_floors=empty_floors, all_animal_options=possible_animals, all_color_options=possible_colors, floor_assignments=[])
     assert len(possible_floor_assignments) == 2
 
+def test_get_possible_floor_assignments_neighbor_hint_both_directions():
+    hint = NeighborHint(Color.Red, Animal.Frog)
+    possible_floor_assignments = hint.get_possible_floor_assignments(empty_floors=[Floor(2), Floor(3)], all_animal_options=list(Animal), all_color_options=list(Color), floor_assignments=[])
+    derived_hints = {derived_hint for _, derived_hints in possible_floor_assignments for derived_hint in derived_hints}
+    assert derived_hints == {AbsoluteHint(Floor(3), Animal.Frog), AbsoluteHint(Floor(4), Animal.Frog), 
+                             AbsoluteHint(Floor(3), Color.Red), AbsoluteHint(Floor(4), Color.Red)}
+
+def test_floor_assignment_is_immutable_and_hashable():
+    floor_assignment = FloorAssignment(floor=Floor.First, color=Color.Red, animal=Animal.Frog)
+    assert floor_assignment == FloorAssignment(Floor.First, Color.Red, Animal.Frog)
+    assert len({floor_assignment, FloorAssignment(Floor.First, Color.Red, Animal.Frog)}) == 1
+    assert pickle.loads(pickle.dumps(floor_assignment)) == floor_assignment
+    with pytest.raises(AttributeError):
+        floor_assignment.color = Color.Blue
+    assignments = list(iter_assignments([AbsoluteHint(Color.Red, Animal.Frog), AbsoluteHint(Color.Red, Floor.First)]))
+    assert all(assignment[0] is assignments[0][0] for assignment in assignments)
+
+def test_search_state_place_and_remove():
+    state = SearchState()
+    assert state.count_completions() == math.factorial(5)*math.factorial(5)
+
+    assert state.place(Color.Red, 3)
+    assert not state.place(Floor.Third, 3)
+    assert state.floor_of(Color.Red) == 3
+    assert not state.can_place(Color.Blue, 3)
+    assert state.can_place(Animal.Frog, 3)
+    assert state.count_completions() == math.factorial(4)*math.factorial(5)
+
+    state.remove(Color.Red)
+    assert state.floor_of(Color.Red) == 0
+    assert state.can_place(Color.Blue, 3)
+    assert state.count_completions() == math.factorial(5)*math.factorial(5)
+
 def test_count_assignments_no_hints():
     counted_assignments = count_assignments([])
     assert counted_assignments == math.factorial(5)*math.factorial(5)
@@ -118,7 +169,8 @@ def test_duplicated_hints():
     ]
 
     assert count_assignments(duplicated_absolute_hint) == math.factorial(5)*math.factorial(4)
-    assert count_assignments(duplicated_neibouring_hints) == math.factorial(5)
+    # A duplicated hint doesn't constrain the assignment more than the hint itself.
+    assert count_assignments(duplicated_neibouring_hints) == 4608
 
 def test_relative_hints():
     single_relative_hint = [
@@ -142,6 +194,518 @@ def test_neighbor_hints():
     ]
     assert(count_assignments(single_neighbor_hint) == 4608)
 
+    # The first attribute is already placed when the neighbor hint is reached.
+    anchored_neighbor_hint = [
+        AbsoluteHint(Color.Blue, Floor.First),
+        NeighborHint(Color.Blue, Animal.Bird)
+    ]
+    assert count_assignments(anchored_neighbor_hint) == math.factorial(4)*math.factorial(4)
+
+def test_transposition_cache():
+    hints = [
+        NeighborHint(Color.Red, Animal.Frog),
+        NeighborHint(Color.Red, Color.Blue),
+        RelativeHint(Color.Blue, Color.Green, 2),
+    ]
+    cache = TranspositionCache()
+    uncached_count = count_assignments(hints, cache=TranspositionCache(max_size=0))
+    assert count_assignments(hints, cache=cache, ordering=order_in_sequence) == uncached_count
+    # The floor of the frog doesn't matter once the red floor is placed.
+    assert cache.hits > 0
+    assert cache.misses == len(cache)
+
+    # Same hints, different order: the whole search is answered from the cache.
+    hits, misses = cache.hits, cache.misses
+    assert count_assignments(list(reversed(hints)), cache=cache) == uncached_count
+    assert (cache.hits, cache.misses) == (hits + 1, misses)
+
+def test_transposition_cache_size_bound():
+    cache = TranspositionCache(max_size=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1
+    cache.put('c', 3)
+    assert len(cache) == 2
+    assert cache.get('b') is None
+    assert cache.get('a') == 1 and cache.get('c') == 3
+    assert (cache.hits, cache.misses) == (3, 1)
+
+    # The hint numbers of the keys are bounded with the counts: the cache is cleared before it numbers more hints
+    # than max_size, but not while another search has the current numbers.
+    cache = TranspositionCache(max_size=3)
+    assert cache.open_search(['a', 'b']) == [0, 1]
+    assert cache.open_search(['c', 'd']) == [2, 3]
+    cache.close_search()
+    cache.close_search()
+    cache.put('key', 1)
+    assert cache.open_search(['b', 'e']) == [0, 1] and len(cache) == 0
+    cache.close_search()
+
+    cache = TranspositionCache(max_size=1)
+    puzzles = [hints for hints, _ in itertools.islice(iter_unique_puzzles(seed=0), 30)]
+    for hints in puzzles:
+        assert count_assignments(hints, cache=cache) == count_assignments(hints)
+        assert len(cache._hint_ids) <= max(len(hints) for hints in puzzles)
+
+def floors_mask(*floors):
+    return sum(1 << floor for floor in floors)
+
+def test_iter_assignments():
+    hints = README_EXAMPLE_2
+    assignments = list(iter_assignments(hints))
+    assert len(assignments) == 4
+    assert FloorAssignment(floor=Floor.First, color=Color.Green, animal=Animal.Chicken) in assignments[0]
+    for assignment in assignments:
+        assert [floor_assignment.floor for floor_assignment in assignment] == list(Floor)
+        assert all(hint.check_if_satisfied(assignment) for hint in hints)
+
+    # The free remainder is expanded lazily.
+    all_assignments = iter_assignments([])
+    assert len(next(all_assignments)) == 5
+    assert len(list(all_assignments)) == math.factorial(5)*math.factorial(5) - 1
+    assert list(iter_assignments([AbsoluteHint(Color.Red, Color.Blue)])) == []
+
+def test_count_assignments_limit():
+    hints = [NeighborHint(Animal.Rabbit, Color.Green)]
+    limited_stats, stats = SearchStats(), SearchStats()
+    assert count_assignments(hints, limit=2, stats=limited_stats) == 2
+    assert count_assignments(hints, stats=stats) == 4608
+    assert limited_stats.nodes < stats.nodes
+
+    assert count_assignments(hints, limit=5000) == 4608
+    assert count_assignments([RelativeHint(Animal.Chicken, Color.Blue, -4), NeighborHint(Animal.Chicken, Color.Blue)], limit=1) == 0
+    # The colors alone have 120 assignments, but the animals have none.
+    assert count_assignments([NeighborHint(Animal.Frog, Animal.Bird), AbsoluteHint(Animal.Frog, Floor.First), AbsoluteHint(Animal.Bird, Floor.Third)], limit=2) == 0
+
+def test_tower_session():
+    session = TowerSession()
+    assert session.count() == math.factorial(5)*math.factorial(5)
+
+    hints = README_EXAMPLE_2
+    for hint in hints:
+        session.add_hint(hint)
+    assert session.count() == 4
+    assert sorted(map(str, session.iter_assignments())) == sorted(map(str, iter_assignments(hints)))
+
+    session.remove_hint(NeighborHint(Animal.Frog, Animal.Grasshopper))
+    assert session.count() == count_assignments(hints[:3] + hints[4:])
+    session.remove_hint(AbsoluteHint(Animal.Bird, Floor.Fifth))
+    assert session.hints == hints[1:3] + hints[4:]
+    assert session.count() == count_assignments(hints[1:3] + hints[4:])
+
+    with pytest.raises(ValueError):
+        session.remove_hint(AbsoluteHint(Animal.Bird, Floor.Fifth))
+
+    # Hints outside the tower are rejected, like by count_assignments, and the session is left as it was.
+    for hint in [AbsoluteHint(Color.Red, 7), RelativeHint(Animal.Frog, 0, 1)]:
+        with pytest.raises(ValueError):
+            count_assignments([hint])
+        with pytest.raises(ValueError):
+            session.add_hint(hint)
+    assert session.hints == hints[1:3] + hints[4:]
+    with pytest.raises(ValueError):
+        TowerSession([AbsoluteHint(Color.Red, 7)])
+
+def test_generate_unique_puzzle():
+    for hints, solution in itertools.islice(iter_unique_puzzles(seed=0), 20):
+        assert list(iter_assignments(hints)) == [solution]
+        # Every hint is needed for the solution to be unique.
+        for index in range(len(hints)):
+            assert count_assignments(hints[:index] + hints[index + 1:], limit=2) == 2
+
+    hints, solution = generate_unique_puzzle(random.Random(0), {AbsoluteHint: 1.0}, minimize=False)
+    assert all(isinstance(hint, AbsoluteHint) for hint in hints)
+    assert count_assignments(hints) == 1
+
+def test_count_assignments_async():
+    hints = [
+        NeighborHint(Color.Red, Animal.Frog),
+        NeighborHint(Color.Blue, Animal.Bird),
+        NeighborHint(Animal.Frog, Animal.Grasshopper),
+        NeighborHint(Color.Red, Color.Orange),
+        RelativeHint(Animal.Bird, Color.Green, 2),
+    ]
+    result = asyncio.run(count_assignments_async(hints, step_nodes=10))
+    assert result.complete and result.count == count_assignments(hints) and result.nodes > 10
+    assert asyncio.run(count_assignments_async(hints, limit=2)).count == 2
+    assert asyncio.run(count_assignments_async([AbsoluteHint(Animal.Bird, Floor.Fifth)])).count == 24 * 120
+
+    result = asyncio.run(count_assignments_async(hints, timeout=0, step_nodes=10))
+    assert not result.complete and result.count is None and result.nodes == 10
+
+    async def count_and_cancel():
+        task = asyncio.create_task(count_assignments_async(hints, step_nodes=1))
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+    asyncio.run(count_and_cancel())
+
+def test_hint_orderings():
+    hints = [
+        NeighborHint(Color.Red, Animal.Frog),
+        RelativeHint(Color.Blue, Color.Green, 2),
+        AbsoluteHint(Floor.Second, Animal.Frog),
+        RelativeHint(Animal.Frog, Animal.Bird, 1),
+    ]
+    state = SearchState()
+    all_pending = 0b1111
+    assert order_in_sequence(hints, all_pending, state) == 0
+    assert order_in_sequence(hints, 0b1100, state) == 2
+    assert order_most_constrained(hints, all_pending, state) == 2
+
+    # Once the frog is placed, the relative hint from it is anchored and has a single placement.
+    state.place(Animal.Frog, 2)
+    assert order_most_constrained(hints, 0b1011, state) == 3
+    for ordering in (order_in_sequence, order_most_constrained):
+        assert count_assignments(hints, ordering=ordering) == count_assignments(hints[::-1], ordering=ordering)
+
+def test_propagate_all_different():
+    domains = [floors_mask(1, 3), floors_mask(3), floors_mask(1, 2, 3, 4, 5), floors_mask(2, 3, 4, 5), floors_mask(2, 3, 4, 5)]
+    assert propagate_all_different(domains)
+    while propagate_all_different(domains):
+        pass
+    assert domains == [floors_mask(1), floors_mask(3), floors_mask(2, 4, 5), floors_mask(2, 4, 5), floors_mask(2, 4, 5)]
+
+    # The fifth floor is a hidden single of the last value.
+    domains = [floors_mask(1, 2), floors_mask(1, 2), floors_mask(3, 4), floors_mask(3, 4), floors_mask(1, 2, 3, 4, 5)]
+    assert propagate_all_different(domains)
+    assert domains[4] == floors_mask(5)
+
+    assert propagate_all_different([floors_mask(1), floors_mask(1), floors_mask(2, 3, 4, 5), floors_mask(2, 3, 4, 5), floors_mask(2, 3, 4, 5)]) is None
+    assert propagate_all_different([floors_mask(1, 2)] * 4 + [floors_mask(1, 2, 3, 4)]) is None
+
+def test_propagation_engine():
+    hints = README_EXAMPLE_2
+    backtrack_stats, propagation_stats = SearchStats(), SearchStats()
+    assert count_assignments(hints, engine='propagation', stats=propagation_stats) == 4
+    assert count_assignments(hints, engine='backtrack', stats=backtrack_stats) == 4
+    assert 0 < propagation_stats.nodes < backtrack_stats.nodes
+
+    assert count_assignments([], engine='propagation') == math.factorial(5)*math.factorial(5)
+    assert count_assignments([RelativeHint(Animal.Rabbit, Color.Green, -2)], engine='propagation') == 1728
+    assert count_assignments([NeighborHint(Animal.Rabbit, Color.Green), AbsoluteHint(Animal.Rabbit, Color.Green)], engine='propagation') == 0
+
+def test_search_stats():
+    hints = README_EXAMPLE_2
+    events = []
+    stats = SearchStats(trace=lambda event, depth, hint: events.append((event, depth, hint)))
+    assert count_assignments(hints, stats=stats, ordering=order_in_sequence) == 4
+    assert set(stats.branches) == {'AbsoluteHint', 'NeighborHint', 'RelativeHint'}
+    assert sum(stats.branches.values()) == stats.nodes - 1 <= stats.placement_checks
+    assert stats.max_depth == len(hints)
+    assert stats.dead_ends == sum(1 for event, _, _ in events if event == 'dead_end') > 0
+    assert stats.cache_hits == sum(1 for event, _, _ in events if event == 'cache_hit')
+    assert stats.cache_hits + stats.cache_misses > 0
+    assert set(stats.phase_times) == {'normalize', 'factorize', 'search'}
+    assert all(phase_time >= 0 for phase_time in stats.phase_times.values())
+    assert all(isinstance(hint, (AbsoluteHint, NeighborHint, RelativeHint)) for event, _, hint in events if event == 'expand')
+
+    propagation_stats = SearchStats()
+    assert count_assignments(hints, engine='propagation', stats=propagation_stats) == 4
+    assert propagation_stats.max_depth > 0 and propagation_stats.branches == {}
+
+def test_vectorized_engine_matches_backtrack():
+    pytest.importorskip('numpy')
+    hint_lists = [
+        [],
+        [AbsoluteHint(Animal.Rabbit, Floor.First), AbsoluteHint(Animal.Bird, Floor.First)],
+        [AbsoluteHint(Floor.Third, Floor.Third)],
+        [RelativeHint(Floor.First, Floor.Third, -2)],
+        [RelativeHint(Animal.Rabbit, Color.Green, -2)],
+        [NeighborHint(Color.Red, Color.Green), RelativeHint(Animal.Frog, Floor.Second, 3)],
+        README_EXAMPLE_2,
+    ]
+    for hints in hint_lists:
+        assert count_assignments(hints, engine='numpy') == count_assignments(hints, engine='backtrack')
+
+def test_hint_pickling():
+    hints = [AbsoluteHint(Animal.Rabbit, Floor.First), RelativeHint(Color.Red, Animal.Frog, -3), NeighborHint(Color.Blue, Floor.Second)]
+    unpickled_hints = pickle.loads(pickle.dumps(hints))
+    assert [type(hint) for hint in unpickled_hints] == [type(hint) for hint in hints]
+    assert [hint.signature for hint in unpickled_hints] == [hint.signature for hint in hints]
+
+def test_count_assignments_many():
+    hint_lists = [
+        [NeighborHint(Color.Red, Animal.Frog), NeighborHint(Color.Red, Color.Blue)],
+        [],
+        [AbsoluteHint(Animal.Rabbit, Floor.First), AbsoluteHint(Animal.Bird, Floor.First)],
+        [RelativeHint(Animal.Rabbit, Color.Green, -2)],
+    ] * 3
+    serial_counts = [count_assignments(hints) for hints in hint_lists]
+    assert list(count_assignments_many(hint_lists, workers=1)) == serial_counts
+    assert list(count_assignments_many(iter(hint_lists), workers=2, chunksize=5)) == serial_counts
+
+    # Counting with another number of workers doesn't disturb a stream over the pool of the first one.
+    counts = count_assignments_many(hint_lists, workers=2, chunksize=1)
+    assert next(counts) == serial_counts[0]
+    assert count_assignments_parallel(hint_lists[0], workers=3) == serial_counts[0]
+    assert list(count_assignments_many(hint_lists[:4], workers=3, chunksize=1)) == serial_counts[:4]
+    assert list(counts) == serial_counts[1:]
+
+def test_count_assignments_parallel():
+    hints = [NeighborHint(Color.Red, Animal.Frog), NeighborHint(Color.Blue, Animal.Bird), NeighborHint(Color.Red, Color.Blue)]
+    subproblems = split_search(hints, 10)
+    assert len(subproblems) >= 10
+    assert count_assignments_parallel(hints, workers=1) == count_assignments(hints)
+    assert count_assignments_parallel(hints, workers=2) == count_assignments(hints)
+    assert count_assignments_parallel([], workers=2) == math.factorial(5)*math.factorial(5)
+
+    # The hints are factorized first: only the groups that need a search are split.
+    hint_lists = [
+        [NeighborHint(Color.Red, Color.Blue), RelativeHint(Animal.Frog, Animal.Bird, 2), AbsoluteHint(Animal.Rabbit, Floor.First)],
+        [AbsoluteHint(Color.Red, Floor.First), AbsoluteHint(Animal.Frog, Floor.First), NeighborHint(Color.Blue, Color.Green)],
+        [NeighborHint(Color.Red, Color.Blue), AbsoluteHint(Color.Red, Floor.First), AbsoluteHint(Color.Blue, Floor.Third)],
+    ]
+    for hints in hint_lists:
+        assert count_assignments_parallel(hints, workers=1) == count_assignments(hints)
+        assert count_assignments_parallel(hints, workers=2) == count_assignments(hints)
+
+def test_hint_equality():
+    assert AbsoluteHint(Animal.Rabbit, Floor.First) == AbsoluteHint(Animal.Rabbit, Floor.First)
+    assert AbsoluteHint(Animal.Rabbit, Floor.First) != AbsoluteHint(Floor.First, Animal.Rabbit)
+    assert RelativeHint(Animal.Rabbit, Floor.First, 1) != RelativeHint(Animal.Rabbit, Floor.First, 2)
+    assert NeighborHint(Color.Red, Color.Blue) != RelativeHint(Color.Red, Color.Blue, 1)
+    assert len({NeighborHint(Color.Red, Color.Blue), NeighborHint(Color.Red, Color.Blue)}) == 1
+
+def test_normalize_hints():
+    # Equivalent hints are rewritten to the same canonical hint.
+    assert normalize_hints([
+        AbsoluteHint(Animal.Rabbit, Floor.First),
+        AbsoluteHint(Floor.First, Animal.Rabbit),
+        RelativeHint(Animal.Rabbit, Floor.First, 0),
+        RelativeHint(Animal.Rabbit, Floor.Second, -1),
+        NeighborHint(Floor.Second, Animal.Rabbit),
+        NeighborHint(Animal.Rabbit, Floor.Second),
+    ]) == [AbsoluteHint(Floor.First, Animal.Rabbit), NeighborHint(Floor.Second, Animal.Rabbit)]
+    assert normalize_hints([RelativeHint(Color.Red, Animal.Frog, -2), RelativeHint(Animal.Frog, Color.Red, 2)]) == [RelativeHint(Animal.Frog, Color.Red, 2)]
+    assert normalize_hints([NeighborHint(Animal.Frog, Floor.Fifth)]) == [AbsoluteHint(Floor.Fourth, Animal.Frog)]
+
+    # Hints that always hold are dropped.
+    assert normalize_hints([AbsoluteHint(Color.Red, Color.Red), RelativeHint(Floor.Third, Floor.First, 2)]) == []
+
+    # Hints that never hold.
+    assert normalize_hints([RelativeHint(Floor.Third, Floor.First, 1)]) is None
+    assert normalize_hints([AbsoluteHint(Floor.Third, Floor.First)]) is None
+    assert normalize_hints([AbsoluteHint(Color.Red, Color.Green)]) is None
+    assert normalize_hints([RelativeHint(Color.Red, Animal.Frog, 5)]) is None
+    assert normalize_hints([RelativeHint(Color.Red, Floor.Fourth, 2)]) is None
+    assert normalize_hints([NeighborHint(Animal.Frog, Animal.Frog)]) is None
+
+def test_factorize_hints():
+    color_hints = [NeighborHint(Color.Red, Color.Green), RelativeHint(Color.Blue, Floor.Second, 1)]
+    animal_hints = [AbsoluteHint(Animal.Frog, Floor.Third), NeighborHint(Animal.Frog, Animal.Bird)]
+    assert factorize_hints(color_hints + animal_hints) == [((0,), color_hints), ((1,), animal_hints)]
+    assert count_assignments(color_hints + animal_hints) == count_assignments(color_hints) * count_assignments(animal_hints) // (math.factorial(5)*math.factorial(5))
+
+    coupling_hint = [NeighborHint(Animal.Bird, Color.Green)]
+    assert factorize_hints(color_hints + animal_hints + coupling_hint) == [((0, 1), color_hints + animal_hints + coupling_hint)]
+
+    floor_hints = [NeighborHint(Floor.First, Floor.Second), RelativeHint(Floor.First, Floor.Fourth, -3)]
+    assert factorize_hints(floor_hints) == [((0,), []), ((1,), [])]
+    assert factorize_hints(floor_hints + [AbsoluteHint(Floor.First, Floor.Second)]) is None
+    assert count_assignments(floor_hints + [AbsoluteHint(Floor.First, Floor.Second)]) == 0
+
+def test_tower_schema():
+    schema = TowerSchema(8, [('Drink', ['Tea', 'Milk', 'Coffee', 'Water', 'Juice', 'Soda', 'Beer', 'Wine']),
+                             ('Pet', ['Cat', 'Dog', 'Fish', 'Horse', 'Snake', 'Owl', 'Mouse', 'Bee']),
+                             ('Car', ['Ford', 'Fiat', 'Audi', 'Opel', 'Seat', 'Mini', 'Kia', 'Saab'])])
+    Drink, Pet = schema.family('Drink'), schema.family('Pet')
+    assert count_assignments([], schema=schema) == math.factorial(8)**3
+
+    # The tea is on the top floor, the cat is right under it and the dog is somewhere below the cat.
+    hints = [AbsoluteHint(Drink.Tea, 8), RelativeHint(Drink.Tea, Pet.Cat, 1), RelativeHint(Pet.Cat, Pet.Dog, 4)]
+    expected_count = math.factorial(7) * math.factorial(6) * math.factorial(8)
+    assert count_assignments(hints, schema=schema) == expected_count
+    assert count_assignments(hints, engine='propagation', schema=schema) == expected_count
+    assert count_assignments(hints + [NeighborHint(Pet.Dog, 1)], schema=schema) == 0
+
+    # Members of IntEnum families are values, not floor numbers.
+    class Size(IntEnum):
+        S = 1
+        M = 2
+        L = 3
+    size_schema = TowerSchema(3, [Size, ('Fruit', ['Apple', 'Pear', 'Plum'])])
+    for engine in ('backtrack', 'propagation'):
+        assert count_assignments([NeighborHint(Size.S, Size.L)], engine=engine, schema=size_schema) == 24
+        assert count_assignments([AbsoluteHint(Size.S, 3), RelativeHint(Size.M, Size.S, -2)], engine=engine, 
+                                 schema=size_schema) == 6
+
+    # Schemas of equal families share them, instead of registering new ones.
+    family_count = len(FAMILY_KEYS)
+    same_schema = TowerSchema(8, [(family.__name__, [value.name for value in family]) for family in schema.families])
+    assert same_schema.families == schema.families and len(FAMILY_KEYS) == family_count
+    assert count_assignments(hints, schema=same_schema) == expected_count
+
+    with pytest.raises(ValueError):
+        count_assignments([AbsoluteHint(Drink.Tea, 9)], schema=schema)
+    with pytest.raises(ValueError):
+        count_assignments([AbsoluteHint(Color.Red, 2)], schema=schema)
+    with pytest.raises(ValueError):
+        TowerSchema(3, [('Drink', ['Tea', 'Milk'])])
+
+def test_small_tower_schema_enumeration():
+    schema = TowerSchema(3, [('Drink', ['Tea', 'Milk', 'Coffee']), ('Pet', ['Cat', 'Dog', 'Fish'])])
+    Drink, Pet = schema.family('Drink'), schema.family('Pet')
+    hints = [NeighborHint(Drink.Tea, Pet.Cat), RelativeHint(Pet.Dog, Drink.Milk, -1)]
+    assignments = list(iter_assignments(hints, schema=schema))
+    assert len(assignments) == count_assignments(hints, schema=schema) == 4
+    for assignment in assignments:
+        floors = {value: floor for floor, *values in assignment for value in values}
+        assert abs(floors[Drink.Tea] - floors[Pet.Cat]) == 1
+        assert floors[Drink.Milk] - floors[Pet.Dog] == 1
+
+def test_count_absolute_hints():
+    hint_lists = [
+        [AbsoluteHint(Color.Red, Floor.First), AbsoluteHint(Animal.Frog, Floor.Third)],
+        [AbsoluteHint(Color.Red, Animal.Frog), AbsoluteHint(Color.Blue, Animal.Bird), AbsoluteHint(Animal.Frog, Floor.Second)],
+        [AbsoluteHint(Color.Red, Animal.Frog), AbsoluteHint(Animal.Frog, Color.Green)],
+        [AbsoluteHint(Color.Red, Animal.Frog), AbsoluteHint(Color.Red, Floor.First), AbsoluteHint(Animal.Frog, Floor.Second)],
+    ]
+    for hints in hint_lists:
+        assert count_absolute_hints(normalize_hints(hints)) == count_assignments(hints, engine='propagation')
+    assert count_assignments(hint_lists[1]) == math.factorial(3) * math.factorial(3) * 4
+    assert count_assignments(hint_lists[2]) == 0
+
+    schema = TowerSchema(12, [('X', [f'X{value}' for value in range(12)]), ('Y', [f'Y{value}' for value in range(12)])])
+    X, Y = (list(family) for family in schema.families)
+    hints = [AbsoluteHint(X[value], Y[11 - value]) for value in range(6)] + [AbsoluteHint(X[0], 12)]
+    assert count_assignments(hints, schema=schema) == math.factorial(11) * math.factorial(6)
+
+def test_compile_hints():
+    hints = README_EXAMPLE_2
+    satisfied = compile_hints(hints)
+    solutions = list(iter_assignments(hints))
+    assert all(satisfied(pack_assignment(solution)) for solution in solutions)
+    permutations = list(itertools.permutations(range(1, 6)))
+    assert sum(1 for colors in permutations for animals in permutations if satisfied((colors, animals))) == len(solutions) == 4
+    assert compile_hints([])(([1, 2, 3, 4, 5], [1, 2, 3, 4, 5]))
+    assert not compile_hints([AbsoluteHint(Floor.First, Floor.Second)])(([1, 2, 3, 4, 5], [1, 2, 3, 4, 5]))
+    for difference in ('1 or print("INJECTED") or 1', 1.5, True):
+        with pytest.raises(ValueError):
+            compile_hints([RelativeHint(Color.Red, Color.Blue, difference)])
+
+    schema = TowerSchema(3, [('Drink', ['Tea', 'Milk', 'Coffee']), ('Pet', ['Cat', 'Dog', 'Fish'])])
+    Drink, Pet = schema.family('Drink'), schema.family('Pet')
+    hints = [NeighborHint(Drink.Tea, Pet.Cat), RelativeHint(Pet.Dog, Drink.Milk, -1)]
+    satisfied = compile_hints(hints, schema)
+    assert all(satisfied(pack_assignment(solution, schema)) for solution in iter_assignments(hints, schema=schema))
+    assert sum(1 for drinks in itertools.permutations(range(1, 4)) for pets in itertools.permutations(range(1, 4))
+               if satisfied((drinks, pets))) == count_assignments(hints, schema=schema)
+
+def test_hint_serialization():
+    line = '[["A","Rabbit",1],["N","Red","Green"],["R","Chicken","Blue",-4]]'
+    hints = loads_hints(line)
+    assert hints == [AbsoluteHint(Animal.Rabbit, Floor.First), NeighborHint(Color.Red, Color.Green), RelativeHint(Animal.Chicken, Color.Blue, -4)]
+    assert dumps_hints(hints) == line
+    assert loads_hints('[]') == []
+    assert loads_hints('[["A",1,"Red"]]') == [AbsoluteHint(Floor.First, Color.Red)]
+    for invalid_line in ('[["X","Red",1]]', '[["A","Purple",1]]', '[["R","Red",1]]', '{"A": 1}', '[["A"',
+                         '[["R","Red","Blue","x"]]', '[["R","Red","Blue",1.5]]', '[["R","Red","Blue",true]]',
+                         '[["A",true,"Red"]]', '[["A",1.0,"Red"]]', '[["A","Red","Blue",1]]', '[["N","Red","Blue",1]]',
+                         '[["A","Rabbit",9]]', '[["A","Rabbit",0]]', '[["N",-1,"Red"]]'):
+        with pytest.raises(ValueError):
+            loads_hints(invalid_line)
+
+def test_command_line(tmp_path, capsys):
+    puzzle_file = tmp_path / 'puzzles.jsonl'
+    puzzle_file.write_text('[["A","Rabbit",1],["A","Chicken",2],["A",3,"Yellow"],["A","Bird",5],["A","Grasshopper","Blue"],["N","Red","Green"]]\n'
+                           '\n'
+                           '[["R","Rabbit","Green",-2]]\n'
+                           '[]\n')
+    assert main([str(puzzle_file)]) == 0
+    assert capsys.readouterr().out == '2\n1728\n14400\n'
+
+    counts_file = tmp_path / 'counts.txt'
+    assert main([str(puzzle_file), '-o', str(counts_file), '--workers', '2', '--chunksize', '1']) == 0
+    assert counts_file.read_text() == '2\n1728\n14400\n'
+
+    puzzle_file.write_text('[]\n[["A","Purple",1]]\n')
+    assert main([str(puzzle_file)]) == 1
+    assert 'Line 2' in capsys.readouterr().err
+    for invalid_hint in ('["R","Red","Blue","x"]', '["R","Red","Blue",1.5]', '["A",true,"Red"]', '["N","Red","Blue",1]',
+                         '["A","Rabbit",9]'):
+        puzzle_file.write_text(f'[]\n[{invalid_hint}]\n')
+        assert main([str(puzzle_file)]) == 1
+        assert 'Line 2: Invalid hint' in capsys.readouterr().err
+
+    assert main([str(tmp_path / 'missing.jsonl')]) == 1
+    assert 'missing.jsonl' in capsys.readouterr().err
+    assert main([str(puzzle_file), '-o', str(tmp_path / 'missing' / 'counts.txt')]) == 1
+    assert 'counts.txt' in capsys.readouterr().err
+
+def test_canonical_hints_key():
+    hints = [NeighborHint(Color.Red, Animal.Frog), RelativeHint(Animal.Bird, Color.Green, -2), AbsoluteHint(Floor.First, Color.Blue)]
+    rewritten_hints = [AbsoluteHint(Color.Blue, Floor.First), RelativeHint(Color.Green, Animal.Bird, 2), 
+                       NeighborHint(Animal.Frog, Color.Red), NeighborHint(Color.Red, Animal.Frog)]
+    assert canonical_hints_key(hints) == canonical_hints_key(rewritten_hints)
+    assert canonical_hints_key(hints) != canonical_hints_key(hints[:2])
+    assert canonical_hints_key([AbsoluteHint(Color.Red, Color.Blue)]) is None
+
+def test_result_cache(tmp_path):
+    hints = [NeighborHint(Color.Red, Animal.Frog), RelativeHint(Animal.Bird, Color.Green, -2)]
+    path = str(tmp_path / 'counts.sqlite')
+    with ResultCache(path) as result_cache:
+        assert count_assignments_cached(hints, result_cache) == count_assignments(hints)
+        assert count_assignments_cached(hints[::-1], result_cache) == count_assignments(hints)
+        assert (result_cache.hits, result_cache.misses) == (1, 1)
+        assert result_cache.hit_rate == 0.5
+    with ResultCache(path) as result_cache:
+        assert count_assignments_cached(hints, result_cache) == count_assignments(hints)
+        assert (result_cache.hits, result_cache.misses) == (1, 0)
+        assert list(count_assignments_many([hints, [], hints[:1]], workers=1, result_cache=result_cache)) == \
+            [count_assignments(hints), 14400, count_assignments(hints[:1])]
+        assert (result_cache.hits, result_cache.misses) == (2, 2)
+
+    with ResultCache(str(tmp_path / 'small.sqlite'), max_entries=2) as result_cache:
+        for key in 'abcd':
+            result_cache.put(key, 1)
+        assert len(result_cache) == 2
+        assert result_cache.get('a') is None and result_cache.get('d') == 1
+
+def test_backtrack_does_not_recurse():
+    floor_count = 150
+    schema = TowerSchema(floor_count, [('Chain', [f'Link{value}' for value in range(floor_count)])])
+    links = list(schema.families[0])
+    # Every link is right above the previous one, and the first link is next to the second floor, so it's on the first.
+    hints = [RelativeHint(links[value + 1], links[value], 1) for value in range(floor_count - 1)] + [NeighborHint(links[0], 2)]
+    recursion_limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(120)
+    try:
+        assert count_assignments(hints, schema=schema) == 1
+        assert count_assignments(hints[:-1], schema=schema, limit=1) == 1
+        assert len(list(iter_assignments(hints, schema=schema))) == 1
+    finally:
+        sys.setrecursionlimit(recursion_limit)
+
+def test_backtrack_scales_to_thousands_of_hints():
+    def search_peak_memory(hints, state):
+        stats = SearchStats()
+        tracemalloc.start()
+        try:
+            count = backtrack(hints, state, cache=TranspositionCache(), stats=stats)
+            peak_size = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        return count, stats.nodes, peak_size
+
+    # Repeats of hints, unnormalized, are only searched once.
+    hints = README_EXAMPLE_2 + [
+        NeighborHint(Animal.Grasshopper, Animal.Frog),
+        RelativeHint(Color.Blue, Animal.Chicken, 4),
+    ]
+    count, nodes, peak_size = search_peak_memory(hints * 500, SearchState())
+    assert count == 4 and nodes < 100 and peak_size < 1024 * 1024
+
+    # A chain of distinct hints takes a node per hint, and memory linear in their number (up to the cache's keys).
+    floor_count = 2000
+    schema = TowerSchema(floor_count, [('LongChain', [f'Link{value}' for value in range(floor_count)])])
+    links = list(schema.families[0])
+    hints = [RelativeHint(links[value + 1], links[value], 1) for value in range(floor_count - 1)] + [NeighborHint(links[0], 2)]
+    count, nodes, peak_size = search_peak_memory(hints, SearchState(schema=schema))
+    assert count == 1 and nodes <= 2 * floor_count and peak_size < 16 * 1024 * 1024
+
 def assignment_tests():
     """
     Tests given in the assignment document.